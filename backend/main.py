@@ -1,19 +1,25 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from bs4 import BeautifulSoup
-import requests
-from typing import Dict, Any, Optional
-import validators
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Dict, Any, List, Optional
 import logging
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings
-import json
+import orjson
+import base64
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from cachetools import TTLCache
 
 from utils.extractors import (
     is_valid_url,
+    normalize_url,
+    parse_page,
+    ExtractionBundle,
     extract_title,
     extract_css_links,
+    filter_css_links,
     extract_css_content,
     extract_colors_from_css,
     extract_fonts_from_css,
@@ -23,22 +29,41 @@ from utils.extractors import (
     extract_component_descriptions,
     extract_raw_html_snippet,
     get_page_content,
-    process_screenshot_for_llm
+    fetch_stylesheets,
+    process_screenshot_for_llm,
+    http_client,
+    context_pool
 )
 
+from utils.browser_pool import browser_pool
+from utils.css_scan import scan_css
+
 from utils.llm_generator import (
     configure_gemini,
+    warmup_gemini,
+    enable_semantic_cache,
     generate_website_code,
+    stream_website_code,
+    create_website_prompt,
+    parse_generated_code,
+    llm_cache,
+    LLMCache,
     WebsiteCode
 )
 
 # Settings for API configuration
 class Settings(BaseSettings):
     gemini_api_key: str
+    # Opt-in embedding match of near-duplicate design contexts
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.97
     
     class Config:
         env_file = ".env"
 
+# Gemini model used for website generation
+GEMINI_MODEL = "gemini-2.0-flash"
+
 # Request/Response models
 class GenerateWebsiteRequest(BaseModel):
     url: str
@@ -48,9 +73,37 @@ class GenerateWebsiteResponse(BaseModel):
     html: str
     css: str
     error: Optional[str] = None
+    # Small design summary always returned; the full context is opt-in
+    color_palette: Optional[List[str]] = None
+    fonts: Optional[List[str]] = None
     design_context: Optional[Dict[str, Any]] = None
     screenshot: Optional[Dict[str, Any]] = None
 
+# Design context cache keyed by normalized URL, bounded by approximate bytes
+# since each context carries its screenshot image
+DESIGN_CONTEXT_CACHE_BYTES = 128 * 1024 * 1024
+DESIGN_CONTEXT_BASE_SIZE = 64 * 1024  # rough size of everything but the image
+
+def design_context_size(design_context: Dict[str, Any]) -> int:
+    """Approximate memory held by a cached design context."""
+    screenshot = design_context.get("screenshot") or {}
+    return DESIGN_CONTEXT_BASE_SIZE + len(screenshot.get("image") or b"")
+
+design_context_cache: TTLCache = TTLCache(
+    maxsize=DESIGN_CONTEXT_CACHE_BYTES,
+    ttl=3600,
+    getsizeof=design_context_size
+)
+
+# Pipeline runs in flight, keyed like design_context_cache
+design_context_builds: Dict[str, asyncio.Task] = {}
+
+# Worker pool for running independent extractors in parallel
+extractor_pool = ThreadPoolExecutor(max_workers=8)
+
+# Caps concurrent Gemini generations started by the batch endpoint
+batch_semaphore = asyncio.Semaphore(20)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -59,7 +112,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Website Design Context and Generation API",
     description="API for extracting design context and generating cloned websites using Gemini Pro",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -72,14 +126,31 @@ app.add_middleware(
 )
 
 # Dependencies
-async def get_settings():
+@lru_cache(maxsize=1)
+def load_settings() -> Settings:
+    # Read .env once per process instead of on every request
     return Settings()
 
+async def get_settings():
+    return load_settings()
+
 @app.on_event("startup")
 async def startup_event():
-    # Configure Gemini on startup
+    # Configure Gemini and build the shared model on startup
     settings = await get_settings()
-    configure_gemini(settings.gemini_api_key)
+    configure_gemini(settings.gemini_api_key, model_names=[GEMINI_MODEL])
+    if settings.semantic_cache_enabled:
+        enable_semantic_cache(settings.semantic_cache_threshold)
+    # Prime the Gemini connection in the background so startup isn't delayed
+    app.state.gemini_warmup = asyncio.create_task(warmup_gemini())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Release the shared browser, pooled outbound connections and extractor workers
+    await context_pool.close()
+    await browser_pool.close()
+    await http_client.aclose()
+    extractor_pool.shutdown(wait=False)
 
 @app.get("/")
 async def root():
@@ -96,16 +167,100 @@ async def generate_website(
     Parameters:
     - url: The website URL to clone
     - options: Optional configuration for generation
+      (set "include_context": true to also return the extracted design context)
     
     Returns:
-    - Generated HTML and CSS code
+    - Generated HTML and CSS code, plus the page's color palette and fonts
     """
-    try:
-        # Configure Gemini with API key
-        configure_gemini(settings.gemini_api_key)
+    # Gemini is configured once at startup
+    return await clone_website(request)
+
+@app.post("/api/generate/batch", response_model=List[GenerateWebsiteResponse])
+async def generate_websites_batch(
+    batch: List[GenerateWebsiteRequest],
+    settings: Settings = Depends(get_settings)
+) -> List[GenerateWebsiteResponse]:
+    """
+    Generate cloned websites for several URLs concurrently.
+    
+    Parameters:
+    - A list of generation requests (url and options)
+    
+    Returns:
+    - One response per request, in order; failed items carry an error message
+    """
+    async def clone_one(request: GenerateWebsiteRequest) -> GenerateWebsiteResponse:
+        async with batch_semaphore:
+            return await clone_website(request)
+    
+    results = await asyncio.gather(
+        *(clone_one(request) for request in batch),
+        return_exceptions=True
+    )
+    
+    responses = []
+    for result in results:
+        if isinstance(result, HTTPException):
+            responses.append(GenerateWebsiteResponse(html="", css="", error=str(result.detail)))
+        elif isinstance(result, Exception):
+            responses.append(GenerateWebsiteResponse(html="", css="", error=str(result)))
+        else:
+            responses.append(result)
+    
+    return responses
+
+@app.post("/api/generate/stream")
+async def generate_website_stream(request: GenerateWebsiteRequest) -> StreamingResponse:
+    """
+    Generate a cloned website, streaming Gemini's output as Server-Sent Events.
+    
+    Parameters:
+    - url: The website URL to clone
+    
+    Returns:
+    - A text/event-stream of `data` events carrying generated text chunks,
+      followed by a `done` event with the parsed HTML and CSS (or an `error` event)
+    """
+    design_context = await get_design_context(request.url)
+    prompt = create_website_prompt(design_context)
+    cache_key = LLMCache.key(GEMINI_MODEL, prompt)
+    
+    def sse_event(payload: Dict[str, Any], event: Optional[str] = None) -> bytes:
+        # Frames are written as bytes straight from orjson, with no str round trip
+        prefix = f"event: {event}\n".encode() if event else b""
+        return prefix + b"data: " + orjson.dumps(payload) + b"\n\n"
+    
+    async def event_stream():
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            yield sse_event({"html": cached.html, "css": cached.css}, event="done")
+            return
+        
+        chunks = []
+        try:
+            async for text in stream_website_code(design_context, model_name=GEMINI_MODEL, prompt=prompt):
+                chunks.append(text)
+                yield sse_event({"text": text})
+        except Exception as e:
+            logger.error(f"Error streaming website generation: {str(e)}")
+            yield sse_event({"error": str(e)}, event="error")
+            return
         
+        generated_code = parse_generated_code("".join(chunks))
+        if generated_code.error or not generated_code.html or not generated_code.css:
+            yield sse_event({"error": generated_code.error or "Generated code is incomplete or invalid"}, event="error")
+            return
+        
+        await llm_cache.set(cache_key, generated_code)
+        yield sse_event({"html": generated_code.html, "css": generated_code.css}, event="done")
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+async def clone_website(request: GenerateWebsiteRequest) -> GenerateWebsiteResponse:
+    """Extract design context for a request's URL and generate its clone."""
+    try:
         # First, extract design context
-        design_context = await extract_design_context(request.url)
+        design_context = await get_design_context(request.url)
         
         if not design_context:
             raise HTTPException(
@@ -113,10 +268,10 @@ async def generate_website(
                 detail="Failed to extract design context from the provided URL"
             )
         
-        # Generate website code using Gemini
+        # Generate website code using Gemini; identical prompts are served from llm_cache
         generated_code = await generate_website_code(
             design_context=design_context,
-            model_name="gemini-2.0-flash"
+            model_name=GEMINI_MODEL
         )
         
         # Check for generation errors
@@ -133,12 +288,18 @@ async def generate_website(
                 detail="Generated code is incomplete or invalid"
             )
         
-        # Return response with both generated code and design context
+        html, css = generated_code.html, generated_code.css
+        
+        # Only ship the (large) design context to clients that ask for it
+        include_context = (request.options or {}).get("include_context")
+        
         return GenerateWebsiteResponse(
-            html=generated_code.html,
-            css=generated_code.css,
+            html=html,
+            css=css,
             error=None,
-            design_context=design_context
+            color_palette=design_context.get("color_palette"),
+            fonts=design_context.get("fonts"),
+            design_context=serialize_design_context(design_context) if include_context else None
         )
         
     except HTTPException:
@@ -161,23 +322,88 @@ async def extract_design_context(url: str) -> Dict[str, Any]:
     Returns:
     - Dictionary containing detailed design context for LLM consumption
     """
+    return serialize_design_context(await get_design_context(url))
+
+def serialize_design_context(design_context: Dict[str, Any]) -> Dict[str, Any]:
+    """Make a design context JSON-safe; the screenshot is base64 encoded only here."""
+    screenshot = design_context.get("screenshot")
+    if not screenshot:
+        return design_context
+    
+    screenshot = dict(screenshot)
+    image = screenshot.pop("image", None)
+    screenshot["base64_image"] = base64.b64encode(image).decode("ascii") if image else None
+    return {**design_context, "screenshot": screenshot}
+
+async def get_design_context(url: str) -> Dict[str, Any]:
+    """Return the (cached) in-process design context for a URL, screenshot as raw bytes."""
     # Validate URL
     if not is_valid_url(url):
         raise HTTPException(status_code=400, detail="Invalid URL format")
     
+    # Serve repeated requests for the same page from cache
+    cache_key = normalize_url(url)
+    if cache_key in design_context_cache:
+        return design_context_cache[cache_key]
+    
+    # Only one request per URL runs the pipeline; concurrent callers share its task,
+    # shielded so one caller's cancellation doesn't cancel it for the others
+    task = design_context_builds.get(cache_key)
+    if task is None:
+        task = asyncio.ensure_future(build_and_cache_design_context(url, cache_key))
+        design_context_builds[cache_key] = task
+        task.add_done_callback(lambda _: design_context_builds.pop(cache_key, None))
+    return await asyncio.shield(task)
+
+async def build_and_cache_design_context(url: str, cache_key: str) -> Dict[str, Any]:
+    """Run the pipeline for a URL and cache its design context."""
+    result = await build_design_context(url)
+    design_context_cache[cache_key] = result
+    return result
+
+async def analyze_page(bundle: ExtractionBundle, all_css: str) -> Dict[str, Any]:
+    """Run the CSS and component extractors in parallel over a collected page."""
+    loop = asyncio.get_running_loop()
+    tasks = {
+        "css_scan": loop.run_in_executor(extractor_pool, scan_css, all_css),
+        "components": loop.run_in_executor(extractor_pool, extract_component_descriptions, bundle)
+    }
+    results = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+    
+    # The CSS was scanned once above, off the event loop; these only read the scan
+    css_scan = results["css_scan"]
+    colors = extract_colors_from_css(css_scan)
+    
+    # Combine fonts from both CSS and inline styles
+    all_fonts = sorted(list(extract_fonts_from_css(css_scan).union(extract_fonts_from_inline_styles(bundle))))
+    component_descriptions, layout = results["components"]
+    
+    return {
+        "title": extract_title(bundle),
+        "layout": layout,
+        "color_palette": colors,
+        "fonts": all_fonts,
+        "images": extract_images(bundle),
+        "text_snippets": extract_text_snippets(bundle),
+        "raw_html_snippet": extract_raw_html_snippet(bundle),
+        "component_descriptions": component_descriptions
+    }
+
+async def build_design_context(url: str) -> Dict[str, Any]:
+    """Run the full fetch and extraction pipeline for a URL."""
     try:
         # Fetch page content using Playwright with anti-bot measures
         content = await get_page_content(url)
         
         if not content:
-            # Fallback to regular requests if Playwright fails
-            logger.warning("Playwright fetch failed, falling back to requests")
+            # Fallback to a plain HTTP fetch if Playwright fails
+            logger.warning("Playwright fetch failed, falling back to plain HTTP fetch")
             try:
                 headers = {
                     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
                     "Accept-Language": "en-US,en;q=0.9",
                 }
-                response = requests.get(url, timeout=15, headers=headers)
+                response = await http_client.get(url, headers=headers)
                 response.raise_for_status()
                 content = {
                     "html": response.text,
@@ -187,48 +413,33 @@ async def extract_design_context(url: str) -> Dict[str, Any]:
             except Exception as e:
                 raise HTTPException(status_code=400, detail=f"Failed to fetch URL: {str(e)}")
         
-        # Parse HTML
-        soup = BeautifulSoup(content["html"], 'html.parser')
+        # Parse HTML and walk it once, off the event loop
+        bundle = await asyncio.to_thread(parse_page, content["html"], url)
         
-        # Extract CSS links and fetch their content
-        css_links = extract_css_links(soup, url)
-        all_css = content["css"] or ""  # Start with computed/inline CSS
+        # Extract relevant CSS links and fetch their content
+        css_links = filter_css_links(extract_css_links(bundle), url)
+        # Start with computed CSS; pages fetched without a browser only have their <style> blocks
+        css_chunks = [content["css"] or "\n".join(bundle.style_blocks)]
         
-        # Fetch and combine external CSS
-        for css_url in css_links:
-            try:
-                css_response = requests.get(css_url, timeout=10)
-                if css_response.ok:
-                    all_css += "\n" + css_response.text
-            except:
-                logger.warning(f"Failed to fetch CSS from {css_url}")
-        
-        # Extract fonts from both CSS and inline styles
-        fonts_from_css = extract_fonts_from_css(all_css)
-        fonts_from_inline = extract_fonts_from_inline_styles(soup)
-        all_fonts = sorted(list(fonts_from_css.union(fonts_from_inline)))
-        
-        # Extract component descriptions and layout
-        component_descriptions, layout = extract_component_descriptions(soup)
-        
-        # Process screenshot if available
-        screenshot_data = None
+        # Fetch external CSS concurrently and combine in a single join; sheets the
+        # browser already returned over CDP aren't downloaded again
+        already_read = set(content.get("css_sources") or ())
+        css_chunks.extend(await fetch_stylesheets([css_url for css_url in css_links if css_url not in already_read]))
+        all_css = "\n".join(css_chunks)
+        
+        # Run CPU-bound extraction and screenshot processing in worker threads
+        # so a single large page doesn't stall other requests
+        analysis_task = analyze_page(bundle, all_css)
         if content.get("screenshot"):
-            screenshot_data = process_screenshot_for_llm(content["screenshot"])
-        
-        # Build enhanced response
-        result = {
-            "title": extract_title(soup),
-            "layout": layout,
-            "color_palette": extract_colors_from_css(all_css),
-            "fonts": all_fonts,
-            "images": extract_images(soup, url),
-            "text_snippets": extract_text_snippets(soup),
-            "css_links": css_links,
-            "raw_html_snippet": extract_raw_html_snippet(soup),
-            "component_descriptions": component_descriptions,
-            "screenshot": screenshot_data
-        }
+            result, screenshot_data = await asyncio.gather(
+                analysis_task,
+                asyncio.to_thread(process_screenshot_for_llm, content["screenshot"])
+            )
+        else:
+            result, screenshot_data = await analysis_task, None
+        
+        result["css_links"] = css_links
+        result["screenshot"] = screenshot_data
         
         return result
         
@@ -237,5 +448,17 @@ async def extract_design_context(url: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    
+    # uvloop event loop and httptools parser. Each worker process gets its own
+    # HTTP client, caches, Gemini models and Chromium with a context pool, so
+    # workers are opt-in via WEB_CONCURRENCY; the Gemini limits are split across them
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1"))
+    ) 
\ No newline at end of file
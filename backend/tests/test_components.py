@@ -0,0 +1,46 @@
+import unittest
+
+from utils.extractors import extract_component_descriptions, parse_page
+
+PAGE = """
+<html><body>
+  <header class="site-header">
+    <nav>
+      <img src="/logo.png">
+      <a href="/">Home</a><a href="/shop">Shop</a><a href="/about">About</a>
+    </nav>
+  </header>
+  <section class="hero">
+    <h1>Welcome</h1>
+    <a class="btn" href="/shop">Shop now</a>
+    <img src="/hero.jpg">
+  </section>
+  <section class="cards">
+    <div class="card"><img src="/a.jpg"><h3>A</h3></div>
+    <div class="card"><img src="/b.jpg"><h3>B</h3></div>
+    <div class="card"><img src="/c.jpg"><h3>C</h3></div>
+  </section>
+  <footer>
+    <a href="/privacy">Privacy</a>
+    <a class="social" href="https://x.com/example">X</a>
+    <a class="social" href="https://github.com/example">GitHub</a>
+  </footer>
+</body></html>
+"""
+
+class ComponentDescriptionsTest(unittest.TestCase):
+    def test_nested_sections(self):
+        bundle = parse_page(PAGE, "https://example.com/")
+        components, layout = extract_component_descriptions(bundle)
+
+        # The nav nested in the header is reported once, counted from the outer element
+        self.assertEqual(components, [
+            "Navbar with 3 navigation links and logo",
+            "Hero section with 1 heading(s) and 1 call-to-action button(s) featuring hero image",
+            "Grid of 3 product/content cards with images",
+            "Footer with 3 links including 2 social media links",
+        ])
+        self.assertEqual(layout, ["navbar", "hero", "product-grid", "footer"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from unittest import mock
+
+from utils.extractors import ProxyManager
+
+class ProxyManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("utils.extractors.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = ProxyManager()
+
+    def next_server(self):
+        proxy = self.manager.get_next_proxy()
+        return proxy and proxy["server"]
+
+    def test_rotates_least_recently_used(self):
+        self.manager.add_proxy("http://a")
+        self.manager.add_proxy("http://b")
+        self.assertEqual(self.next_server(), "http://a")
+        self.now += 5
+        self.assertEqual(self.next_server(), "http://b")
+        self.now += 5
+        self.assertEqual(self.next_server(), "http://a")
+
+    def test_skips_recently_used_proxy(self):
+        self.manager.add_proxy("http://a")
+        self.assertEqual(self.next_server(), "http://a")
+        self.now += 1
+        self.assertIsNone(self.manager.get_next_proxy())
+        self.now += ProxyManager.MIN_REUSE_INTERVAL
+        self.assertEqual(self.next_server(), "http://a")
+
+    def test_recently_used_proxy_yields_to_penalized_one(self):
+        self.manager.add_proxy("http://a")
+        self.manager.add_proxy("http://b")
+        self.manager.mark_proxy_failure("http://a")
+        self.assertEqual(self.next_server(), "http://b")
+        # b is now ahead of a in the heap but too recent, so a is handed out
+        self.now += 1
+        self.assertEqual(self.next_server(), "http://a")
+        # The deferred entry for b is kept
+        self.now += ProxyManager.MIN_REUSE_INTERVAL
+        self.assertEqual(self.next_server(), "http://b")
+
+    def test_drops_proxy_after_max_failures(self):
+        self.manager.add_proxy("http://a")
+        for _ in range(ProxyManager.MAX_FAILURES - 1):
+            self.manager.mark_proxy_failure("http://a")
+        self.assertEqual(self.next_server(), "http://a")
+
+        self.manager.mark_proxy_failure("http://a")
+        self.now += 5
+        self.assertIsNone(self.manager.get_next_proxy())
+        self.assertNotIn("http://a", self.manager._proxies)
+        self.assertEqual(self.manager._heap, [])
+
+    def test_stale_entries_removed_lazily(self):
+        self.manager.add_proxy("http://a")
+        self.manager.add_proxy("http://b")
+        self.manager.mark_proxy_failure("http://a")
+        # The superseded entry for a stays in the heap until it surfaces
+        self.assertEqual(len(self.manager._heap), 3)
+
+        self.assertEqual(self.next_server(), "http://b")
+        self.assertEqual(len(self.manager._heap), 2)
+        self.now += 1
+        self.assertEqual(self.next_server(), "http://a")
+        versions = [(entry[2], entry[3]["version"]) for entry in self.manager._heap]
+        self.assertTrue(all(version == current for version, current in versions))
+
+if __name__ == "__main__":
+    unittest.main()
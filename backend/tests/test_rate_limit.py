@@ -0,0 +1,146 @@
+import unittest
+from contextlib import asynccontextmanager
+from unittest import mock
+
+from utils import extractors
+from utils.rate_limit import CircuitBreaker, TokenBucket
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("utils.rate_limit.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(min_samples=2, reset_timeout=30.0)
+
+    def trip(self):
+        self.breaker.on_failure()
+        self.breaker.on_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_opens_after_failures(self):
+        self.trip()
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_half_open_admits_single_trial(self):
+        self.trip()
+        self.now += 30
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_successful_trial_closes(self):
+        self.trip()
+        self.now += 30
+        self.breaker.allow_request()
+        self.breaker.on_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_trial_reopens(self):
+        self.trip()
+        self.now += 30
+        self.breaker.allow_request()
+        self.breaker.on_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_unreported_trial_expires(self):
+        self.trip()
+        self.now += 30
+        self.assertTrue(self.breaker.allow_request())
+        # The trial never reports back
+        self.now += 29
+        self.assertFalse(self.breaker.allow_request())
+        self.now += 1
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.on_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_released_trial_admits_another(self):
+        self.trip()
+        self.now += 30
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.release_trial()
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+        self.headers = {}
+
+class FakePage:
+    def __init__(self, status):
+        self.status = status
+        self.goto_calls = 0
+
+    async def set_extra_http_headers(self, headers):
+        pass
+
+    async def goto(self, url, **kwargs):
+        self.goto_calls += 1
+        return FakeResponse(self.status)
+
+    async def close(self):
+        pass
+
+class FakeContext:
+    def __init__(self, page):
+        self.page = page
+
+    async def new_page(self):
+        return self.page
+
+    async def new_cdp_session(self, page):
+        raise RuntimeError("no CDP in tests")
+
+class FakeContextPool:
+    def __init__(self, page):
+        self.context = FakeContext(page)
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.context
+
+class PageFetchBreakerTest(unittest.IsolatedAsyncioTestCase):
+    host = "breaker.test"
+
+    async def fetch(self, status):
+        page = FakePage(status)
+        with mock.patch.object(extractors, "context_pool", FakeContextPool(page)):
+            result = await extractors.get_page_content(f"https://{self.host}/missing", render=True)
+        return result, page
+
+    def setUp(self):
+        async def no_cached_page(url, render=False):
+            return None
+
+        patches = [
+            mock.patch.object(extractors, "get_cached_page", no_cached_page),
+            mock.patch.dict(extractors.host_breakers, {self.host: CircuitBreaker()}),
+            mock.patch.dict(extractors.host_buckets, {self.host: TokenBucket(refill_rate=1000, max_rate=1000)}),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.breaker = extractors.host_breakers[self.host]
+
+    async def test_not_found_does_not_open_breaker(self):
+        self.breaker.on_success()
+        for _ in range(3):
+            result, page = await self.fetch(404)
+            self.assertIsNone(result)
+            # A 404 is not retried
+            self.assertEqual(page.goto_calls, 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    async def test_server_errors_count_once_per_request(self):
+        result, page = await self.fetch(503)
+        self.assertIsNone(result)
+        self.assertEqual(page.goto_calls, 3)
+        self.assertEqual([ok for _, ok in self.breaker._samples], [False])
+
+if __name__ == "__main__":
+    unittest.main()
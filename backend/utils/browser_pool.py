@@ -0,0 +1,156 @@
+"""
+Shared Playwright browser instances reused across scraping requests.
+"""
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright, Route
+from playwright.sync_api import sync_playwright, Browser as SyncBrowser
+
+logger = logging.getLogger(__name__)
+
+# Chromium launch flags that reduce automation fingerprints
+BROWSER_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-features=IsolateOrigins,site-per-process",
+    "--disable-site-isolation-trials"
+]
+
+class BrowserPool:
+    """Lazily launches a single Chromium instance and shares it between requests.
+
+    Callers create (and close) their own BrowserContext per request; only the
+    browser process itself is shared.
+    """
+
+    def __init__(self):
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._lock = asyncio.Lock()
+
+    async def get_browser(self) -> Browser:
+        """Return the shared browser, launching (or relaunching) it if needed."""
+        if self._browser and self._browser.is_connected():
+            return self._browser
+
+        async with self._lock:
+            if self._browser and self._browser.is_connected():
+                return self._browser
+
+            if not self._playwright:
+                self._playwright = await async_playwright().start()
+
+            logger.info("Launching shared Chromium browser")
+            self._browser = await self._playwright.chromium.launch(
+                headless=True,
+                args=BROWSER_ARGS
+            )
+            return self._browser
+
+    async def close(self):
+        """Close the shared browser and stop Playwright."""
+        async with self._lock:
+            if self._browser:
+                try:
+                    await self._browser.close()
+                except Exception as e:
+                    logger.warning(f"Failed to close browser: {str(e)}")
+                self._browser = None
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+
+browser_pool = BrowserPool()
+
+class ContextPool:
+    """Bounded pool of warm BrowserContexts on the shared browser.
+
+    Contexts are created lazily, with the init script and request route
+    already installed, and reused after their cookies are cleared. At most `size` contexts are in use
+    at once; further callers wait, which caps browser memory.
+    """
+
+    def __init__(
+        self,
+        size: int = 8,
+        context_options: Optional[Dict[str, Any]] = None,
+        init_script: Optional[str] = None,
+        route_handler: Optional[Callable[[Route], Awaitable[None]]] = None
+    ):
+        self.size = size
+        self.context_options = context_options or {}
+        self.init_script = init_script
+        self.route_handler = route_handler
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[BrowserContext] = []
+
+    async def _new_context(self) -> BrowserContext:
+        browser = await browser_pool.get_browser()
+        context = await browser.new_context(**self.context_options)
+        if self.init_script:
+            await context.add_init_script(self.init_script)
+        if self.route_handler:
+            await context.route("**/*", self.route_handler)
+        return context
+
+    async def _get(self) -> BrowserContext:
+        while self._idle:
+            context = self._idle.pop()
+            # Contexts die with their browser; skip any left from a crashed one
+            if context.browser and context.browser.is_connected():
+                return context
+        return await self._new_context()
+
+    async def _discard(self, context: BrowserContext):
+        try:
+            await context.close()
+        except Exception as e:
+            logger.warning(f"Failed to close browser context: {str(e)}")
+
+    async def _release(self, context: BrowserContext):
+        try:
+            for page in context.pages:
+                await page.close()
+            await context.clear_cookies()
+        except Exception as e:
+            logger.warning(f"Discarding unhealthy browser context: {str(e)}")
+            await self._discard(context)
+            return
+        self._idle.append(context)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[BrowserContext]:
+        """Borrow a context; it is discarded instead of reused if the caller raises."""
+        async with self._slots:
+            context = await self._get()
+            try:
+                yield context
+            except BaseException:
+                await self._discard(context)
+                raise
+            await self._release(context)
+
+    async def close(self):
+        """Close all idle contexts."""
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+# Sync Playwright objects are bound to the thread that created them
+_sync_state = threading.local()
+
+def get_sync_browser() -> SyncBrowser:
+    """Return this thread's shared sync-API browser, launching it on first use."""
+    browser = getattr(_sync_state, "browser", None)
+    if browser and browser.is_connected():
+        return browser
+
+    if getattr(_sync_state, "playwright", None) is None:
+        _sync_state.playwright = sync_playwright().start()
+
+    _sync_state.browser = _sync_state.playwright.chromium.launch(
+        headless=True,
+        args=BROWSER_ARGS
+    )
+    return _sync_state.browser
@@ -0,0 +1,109 @@
+"""
+Single-pass multi-pattern CSS scanning, using Hyperscan when it is installed.
+"""
+from typing import Iterator, List
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+
+try:
+    import hyperscan
+except ImportError:  # Optional dependency; the re module is used instead
+    hyperscan = None
+
+logger = logging.getLogger(__name__)
+
+# Pattern sources shared by the Hyperscan database and the re fallback
+_COLOR_PROPERTY = (
+    r'(?:color|background(?:-color)?|border(?:-(?:top|right|bottom|left))?(?:-color)?'
+    r'|box-shadow|text-shadow|outline-color)\s*:'
+)
+_FONT_PROPERTY = r'font-family\s*:'
+_HEX_COLOR = r'#(?:[0-9a-fA-F]{8}|[0-9a-fA-F]{6}|[0-9a-fA-F]{3,4})\b'  # #rgb(a), #rrggbb(aa)
+_RGB_OPEN = r'rgba?\('
+_RGB_ARGS = r'\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)'
+_VALUE = r'\s*([^;}]+)'
+
+_COLOR_DECLARATION_RE = re.compile(_COLOR_PROPERTY + _VALUE, re.IGNORECASE)
+_FONT_DECLARATION_RE = re.compile(_FONT_PROPERTY + _VALUE, re.IGNORECASE)
+_COLOR_LITERAL_RE = re.compile(f'({_HEX_COLOR})|{_RGB_OPEN}{_RGB_ARGS}', re.IGNORECASE)
+
+@dataclass
+class CssScan:
+    """Everything the CSS extractors need, in source order."""
+    color_values: List[str] = field(default_factory=list)  # values of color-bearing declarations
+    font_families: List[str] = field(default_factory=list)  # values of font-family declarations
+    colors: List[str] = field(default_factory=list)  # every color literal, as lowercase hex
+
+# Bound once; formats integer RGB channels as a lowercase hex color
+HEX_COLOR_FORMAT = '#{:02x}{:02x}{:02x}'.format
+
+def _rgb_hex(red: str, green: str, blue: str) -> str:
+    return HEX_COLOR_FORMAT(int(red), int(green), int(blue))
+
+def iter_hex_colors(text: str) -> Iterator[str]:
+    """Yield every hex or rgb()/rgba() color in text as lowercase hex."""
+    for match in _COLOR_LITERAL_RE.finditer(text):
+        hex_color, red, green, blue = match.groups()
+        yield hex_color.lower() if hex_color else _rgb_hex(red, green, blue)
+
+def _scan_re(css: str) -> CssScan:
+    return CssScan(
+        color_values=_COLOR_DECLARATION_RE.findall(css),
+        font_families=_FONT_DECLARATION_RE.findall(css),
+        colors=list(iter_hex_colors(css))
+    )
+
+if hyperscan is not None:
+    _HS_COLOR_PROPERTY, _HS_FONT_PROPERTY, _HS_HEX_COLOR, _HS_RGB_OPEN = range(4)
+
+    # Hyperscan reports match offsets only, so values and rgb() arguments are
+    # read with an anchored re match from where the property/opening matched
+    _VALUE_AT_RE = re.compile(_VALUE.encode())
+    _RGB_ARGS_AT_RE = re.compile(_RGB_ARGS.encode())
+
+    _hs_database = hyperscan.Database()
+    _hs_database.compile(
+        expressions=[p.encode() for p in (_COLOR_PROPERTY, _FONT_PROPERTY, _HEX_COLOR, _RGB_OPEN)],
+        ids=[_HS_COLOR_PROPERTY, _HS_FONT_PROPERTY, _HS_HEX_COLOR, _HS_RGB_OPEN],
+        elements=4,
+        flags=[
+            hyperscan.HS_FLAG_CASELESS,
+            hyperscan.HS_FLAG_CASELESS,
+            hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST,
+            hyperscan.HS_FLAG_CASELESS
+        ]
+    )
+
+    # Scratch space may not be shared between concurrently scanning threads
+    _hs_local = threading.local()
+
+    def _scan_hyperscan(css: str) -> CssScan:
+        data = css.encode('utf-8', errors='replace')
+        scan = CssScan()
+
+        def on_match(pattern_id: int, start: int, end: int, flags: int, context) -> None:
+            if pattern_id == _HS_HEX_COLOR:
+                scan.colors.append(data[start:end].decode('ascii').lower())
+            elif pattern_id == _HS_RGB_OPEN:
+                args = _RGB_ARGS_AT_RE.match(data, end)
+                if args:
+                    scan.colors.append(_rgb_hex(*args.groups()))
+            else:
+                value = _VALUE_AT_RE.match(data, end)
+                if value:
+                    target = scan.color_values if pattern_id == _HS_COLOR_PROPERTY else scan.font_families
+                    target.append(value.group(1).decode('utf-8', errors='replace'))
+
+        scratch = getattr(_hs_local, "scratch", None)
+        if scratch is None:
+            scratch = _hs_local.scratch = hyperscan.Scratch(_hs_database)
+        _hs_database.scan(data, match_event_handler=on_match, scratch=scratch)
+        return scan
+
+def scan_css(css: str) -> CssScan:
+    """Scan CSS once for color declarations, font families and color literals."""
+    if hyperscan is not None:
+        return _scan_hyperscan(css)
+    return _scan_re(css)
@@ -1,27 +1,44 @@
-from typing import List, Dict, Optional, Set, Tuple, Any
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 import re
 import base64
-from urllib.parse import urljoin, urlparse
-import requests
-from bs4 import BeautifulSoup, Tag
-from playwright.sync_api import sync_playwright, Page, Browser, BrowserContext
-from playwright.async_api import async_playwright
+import asyncio
+import hashlib
+import os
+import heapq
+import itertools
+import time
+from urllib.parse import urljoin, urlparse, urlunparse, urldefrag
+import httpx
+from cachetools import LRUCache, TTLCache
+import diskcache
+from html import escape
+from selectolax.lexbor import LexborHTMLParser
+from playwright.async_api import Browser, BrowserContext, CDPSession, Page, Route, TimeoutError as PlaywrightTimeoutError
 import cssutils
 from PIL import Image
+import numpy as np
 import io
-import webcolors
 from collections import Counter
 import logging
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from collections import defaultdict
-import random
-from datetime import datetime, timedelta
+from .browser_pool import browser_pool, ContextPool, get_sync_browser
+from .rate_limit import host_buckets, host_breakers, parse_retry_after
+from .css_scan import CssScan, iter_hex_colors, HEX_COLOR_FORMAT
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by the application entrypoint
 logger = logging.getLogger(__name__)
 
+# Generic font families and CSS-wide keywords that aren't real font names
+_GENERIC_FAMILIES = frozenset({
+    'inherit', 'initial', 'unset', 'serif', 'sans-serif',
+    'monospace', 'cursive', 'fantasy', 'system-ui'
+})
+
+# Font-family declarations in inline style attributes
+_FONT_FAMILY_RE = re.compile(r'font-family\s*:\s*([^;}]+)', re.IGNORECASE)
+
 # Custom exceptions
 class ScrapingError(Exception):
     """Base exception for scraping errors"""
@@ -37,50 +54,175 @@ class RateLimitError(ScrapingError):
 
 # Proxy configuration
 class ProxyManager:
+    """Hands out the least recently used healthy proxy, in O(log n) per proxy skipped.
+
+    Proxies live in a min-heap keyed by last use plus a penalty per failure;
+    proxies used within MIN_REUSE_INTERVAL are passed over, never waited for.
+    Failures re-push the proxy with a bumped version; stale heap entries are
+    skipped lazily when they surface. All methods are synchronous, so calls
+    from the event loop can't interleave.
+    """
+
+    MAX_FAILURES = 3
+    FAILURE_PENALTY = 30.0  # seconds of extra "recency" per failure
+    MIN_REUSE_INTERVAL = 2.0  # seconds before a proxy is handed out again
+
     def __init__(self):
-        self.proxies = []
-        self.last_rotation = datetime.now()
-        self.rotation_interval = timedelta(minutes=10)
-        self.current_index = 0
+        self._heap: List[Tuple[float, int, int, Dict[str, Any]]] = []
+        self._proxies: Dict[str, Dict[str, Any]] = {}
+        self._counter = itertools.count()
+        
+    def _push(self, proxy: Dict[str, Any]):
+        priority = proxy["last_used"] + self.FAILURE_PENALTY * proxy["failures"]
+        heapq.heappush(self._heap, (priority, next(self._counter), proxy["version"], proxy))
         
     def add_proxy(self, proxy: str):
         """Add a proxy to the pool"""
-        self.proxies.append({
+        entry = {
             "server": proxy,
             "failures": 0,
-            "last_used": datetime.now() - timedelta(minutes=5)
-        })
+            "last_used": time.monotonic() - 300,
+            "version": 0
+        }
+        self._proxies[proxy] = entry
+        self._push(entry)
     
     def get_next_proxy(self) -> Optional[Dict[str, Any]]:
-        """Get the next available proxy with basic load balancing"""
-        if not self.proxies:
-            return None
-            
-        now = datetime.now()
-        if now - self.last_rotation > self.rotation_interval:
-            random.shuffle(self.proxies)
-            self.last_rotation = now
-            
-        # Find a proxy that hasn't failed too much
-        for _ in range(len(self.proxies)):
-            proxy = self.proxies[self.current_index]
-            self.current_index = (self.current_index + 1) % len(self.proxies)
-            
-            if proxy["failures"] < 3 and now - proxy["last_used"] > timedelta(seconds=2):
+        """Get the least recently used proxy that hasn't failed too much"""
+        now = time.monotonic()
+        # Failure penalties, not recency alone, order the heap, so a proxy used
+        # too recently may sit above an idle penalized one; set such entries
+        # aside and put them back afterwards
+        deferred = []
+        try:
+            while self._heap:
+                _, _, version, proxy = self._heap[0]
+                
+                # Skip entries superseded by a later push, and drop failed proxies
+                if version != proxy["version"] or proxy["failures"] >= self.MAX_FAILURES:
+                    heapq.heappop(self._heap)
+                    if proxy["failures"] >= self.MAX_FAILURES:
+                        self._proxies.pop(proxy["server"], None)
+                    continue
+                
+                if now - proxy["last_used"] <= self.MIN_REUSE_INTERVAL:
+                    deferred.append(heapq.heappop(self._heap))
+                    continue
+                
                 proxy["last_used"] = now
+                proxy["version"] += 1
+                heapq.heapreplace(self._heap, (
+                    now + self.FAILURE_PENALTY * proxy["failures"],
+                    next(self._counter),
+                    proxy["version"],
+                    proxy
+                ))
                 return {"server": proxy["server"]}
-                
-        return None
+                    
+            return None
+        finally:
+            for entry in deferred:
+                heapq.heappush(self._heap, entry)
     
     def mark_proxy_failure(self, proxy_server: str):
         """Mark a proxy as failed"""
-        for proxy in self.proxies:
-            if proxy["server"] == proxy_server:
-                proxy["failures"] += 1
-                break
+        proxy = self._proxies.get(proxy_server)
+        if proxy:
+            proxy["failures"] += 1
+            proxy["version"] += 1
+            self._push(proxy)
 
 proxy_manager = ProxyManager()
 
+# Shared async HTTP client so stylesheet and fallback fetches reuse pooled connections
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    timeout=15,
+    http2=True,
+    follow_redirects=True,
+    headers={"Accept-Encoding": "br, gzip"}
+)
+
+# Fetched stylesheets keyed by absolute URL; CDN and font CSS rarely changes
+stylesheet_cache: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+
+# Validators (ETag, Last-Modified) and body of fetched stylesheets, bounded by
+# total CSS size, so expired cache entries are revalidated instead of refetched
+stylesheet_validators: LRUCache = LRUCache(
+    maxsize=64_000_000,
+    getsizeof=lambda entry: len(entry[2]) or 1
+)
+
+# Rendered pages, persisted across restarts and shared between worker
+# processes. Fresh entries are served directly; stale ones are revalidated
+# with the page's ETag/Last-Modified before falling back to a new render.
+PAGE_CACHE_DIR = ".scrape_cache"
+PAGE_CACHE_TTL = 3600
+page_cache = diskcache.Cache(PAGE_CACHE_DIR)
+
+# Stylesheets larger than this are skipped rather than buffered
+MAX_STYLESHEET_BYTES = 2_000_000
+
+# Concurrent stylesheet fetches allowed per origin
+MAX_FETCHES_PER_HOST = 6
+host_semaphores: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(MAX_FETCHES_PER_HOST))
+
+# Stylesheet fetching limits; these hosts serve analytics, consent and ad
+# CSS and scripts that carry no design context
+MAX_CSS_LINKS = 15
+NOISE_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "facebook.net",
+    "hotjar.com",
+    "cookielaw.org",
+    "onetrust.com",
+    "cookiebot.com",
+    "intercomcdn.com",
+    "ampproject.org"
+)
+
+def is_noise_url(css_url: str) -> bool:
+    """Whether a URL belongs to an analytics, consent or ad host."""
+    host = urlparse(css_url).netloc.lower()
+    return any(domain in host for domain in NOISE_DOMAINS)
+
+# Resource types none of the extractors read; they are most of a page's bytes
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+def should_block_request(resource_type: str, url: str) -> bool:
+    """Whether a browser request can be aborted without affecting extraction."""
+    if resource_type == "document":
+        return False
+    return resource_type in BLOCKED_RESOURCE_TYPES or is_noise_url(url)
+
+async def block_nonessential_requests(route: Route):
+    """Route handler that aborts media, fonts and tracker requests."""
+    if should_block_request(route.request.resource_type, route.request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+# Upper bound, in seconds, on waiting for network idle after DOMContentLoaded
+PAGE_SETTLE_TIMEOUT = 3.0
+
+# JPEG quality for page screenshots and the LLM reference image
+SCREENSHOT_JPEG_QUALITY = 70
+
+# Elements whose subtrees none of the extractors read. They are dropped
+# before the HTML leaves the browser and again after parsing.
+IGNORED_TAGS = ('script', 'noscript', 'template', 'svg')
+
+# Serialize the rendered document without IGNORED_TAGS, working on a clone
+# so the live page is left untouched
+SERIALIZE_HTML_JS = f"""() => {{
+    const root = document.documentElement.cloneNode(true);
+    root.querySelectorAll('{', '.join(IGNORED_TAGS)}').forEach(el => el.remove());
+    return (document.doctype ? '<!DOCTYPE html>' : '') + root.outerHTML;
+}}"""
+
 # Browser configuration
 BROWSER_CONFIG = {
     "viewport": {"width": 1280, "height": 800},
@@ -98,19 +240,28 @@ BROWSER_CONFIG = {
     }
 }
 
+# Warm browser contexts with anti-bot measures preinstalled
+context_pool = ContextPool(
+    size=8,
+    context_options={
+        "viewport": BROWSER_CONFIG["viewport"],
+        "user_agent": BROWSER_CONFIG["user_agent"],
+        "extra_http_headers": BROWSER_CONFIG["headers"]
+    },
+    init_script="""
+        Object.defineProperty(navigator, 'webdriver', {
+            get: () => undefined
+        });
+    """,
+    route_handler=block_nonessential_requests
+)
+
 async def setup_browser() -> Tuple[Browser, BrowserContext]:
-    """Setup a browser with anti-bot detection measures."""
-    playwright = async_playwright()
-    playwright_instance = await playwright.start()
-    
-    browser = await playwright_instance.chromium.launch(
-        headless=True,
-        args=[
-            "--disable-blink-features=AutomationControlled",
-            "--disable-features=IsolateOrigins,site-per-process",
-            "--disable-site-isolation-trials"
-        ]
-    )
+    """
+    Setup a browser context with anti-bot detection measures.
+    The browser is shared; callers should close only the returned context.
+    """
+    browser = await browser_pool.get_browser()
     
     # Get proxy configuration
     proxy_config = proxy_manager.get_next_proxy()
@@ -143,396 +294,727 @@ async def setup_browser() -> Tuple[Browser, BrowserContext]:
     
     return browser, context
 
-async def get_page_content(url: str) -> Optional[Dict[str, str]]:
+# Fallback CSS collection when CDP isn't available: serialize every readable
+# stylesheet's rules (cross-origin sheets throw on access and are skipped)
+COLLECT_CSS_JS = """() => {
+    const styleSheets = Array.from(document.styleSheets);
+    return styleSheets
+        .filter(sheet => {
+            try {
+                return sheet.cssRules !== null;
+            } catch (e) {
+                return false;
+            }
+        })
+        .map(sheet => {
+            return Array.from(sheet.cssRules)
+                .map(rule => rule.cssText)
+                .join('\\n');
+        })
+        .join('\\n');
+}"""
+
+def track_stylesheet(stylesheets: Dict[str, str], header: Dict[str, Any]):
+    """Record a page stylesheet reported by CSS.styleSheetAdded, ignoring noise hosts."""
+    # Skip user-agent, injected and inspector sheets; only the page's own count
+    if header.get("origin") != "regular":
+        return
+    source_url = header.get("sourceURL") or ""
+    if source_url and is_noise_url(source_url):
+        return
+    stylesheets[header["styleSheetId"]] = source_url
+
+async def get_stylesheet_texts(cdp: CDPSession, stylesheets: Dict[str, str]) -> Tuple[str, List[str]]:
+    """
+    Fetch the text of all tracked stylesheets concurrently over CDP.
+    Returns the combined CSS and the source URLs of the external sheets it includes.
+    """
+    sheets = list(stylesheets.items())
+    results = await asyncio.gather(
+        *(cdp.send("CSS.getStyleSheetText", {"styleSheetId": sheet_id}) for sheet_id, _ in sheets),
+        return_exceptions=True
+    )
+    texts, sources = [], []
+    for (_, source_url), result in zip(sheets, results):
+        if isinstance(result, Exception) or not result.get("text"):
+            continue
+        texts.append(result["text"])
+        if source_url:
+            sources.append(source_url)
+    return "\n".join(texts), sources
+
+async def wait_for_page_settle(page: Page, timeout: float = PAGE_SETTLE_TIMEOUT):
+    """Wait for the network to go idle, but never longer than `timeout` seconds."""
+    await page.wait_for_selector("body", state="attached")
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout * 1000)
+    except PlaywrightTimeoutError:
+        # Analytics beacons and long-polling keep some pages from ever idling
+        pass
+
+def page_cache_key(url: str) -> str:
+    """Disk cache key for a page URL."""
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+
+async def get_cached_page(url: str, render: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Return cached page content if it is fresh or the server says it's unchanged.
+    With `render` set, entries stored by the plain HTTP fetch (no screenshot) don't count.
+    """
+    key = page_cache_key(url)
+    entry = await asyncio.to_thread(page_cache.get, key)
+    if not entry:
+        return None
+    if render and not entry.get("rendered"):
+        return None
+    if entry["expires"] > time.time():
+        return entry["content"]
+    
+    # Expired: a conditional request is far cheaper than re-rendering
+    headers = {}
+    if entry["etag"]:
+        headers["If-None-Match"] = entry["etag"]
+    if entry["last_modified"]:
+        headers["If-Modified-Since"] = entry["last_modified"]
+    if not headers:
+        return None
+    try:
+        async with http_client.stream("GET", url, headers=headers, timeout=10) as response:
+            if response.status_code != 304:
+                return None
+    except httpx.HTTPError:
+        return None
+    
+    entry["expires"] = time.time() + PAGE_CACHE_TTL
+    await asyncio.to_thread(page_cache.set, key, entry)
+    return entry["content"]
+
+async def store_cached_page(url: str, content: Dict[str, Any], headers: Dict[str, str], rendered: bool):
+    """Persist page content along with its validators and whether a browser rendered it."""
+    entry = {
+        "content": content,
+        "rendered": rendered,
+        "etag": headers.get("etag"),
+        "last_modified": headers.get("last-modified"),
+        "expires": time.time() + PAGE_CACHE_TTL
+    }
+    await asyncio.to_thread(page_cache.set, page_cache_key(url), entry)
+
+# Headers for plain HTTP page fetches, matching the browser's identity
+STATIC_FETCH_HEADERS = {
+    "User-Agent": BROWSER_CONFIG["user_agent"],
+    "Accept": BROWSER_CONFIG["headers"]["Accept"],
+    "Accept-Language": BROWSER_CONFIG["headers"]["Accept-Language"]
+}
+
+# Signs that server-sent HTML is only a shell for client-side rendering
+_EMPTY_APP_ROOT_RE = re.compile(
+    rb'<div[^>]+id=["\']?(?:root|app|__next|__nuxt)["\']?[^>]*>\s*</div>',
+    re.IGNORECASE
+)
+_SCRIPT_BLOCK_RE = re.compile(rb'<script\b.*?</script>', re.IGNORECASE | re.DOTALL)
+_PARAGRAPH_RE = re.compile(rb'<p[\s>]', re.IGNORECASE)
+MIN_STATIC_PARAGRAPHS = 3
+MAX_STATIC_SCRIPT_RATIO = 0.5
+
+def needs_javascript(html: bytes) -> bool:
+    """Cheap check for pages that only render their content client-side."""
+    if _EMPTY_APP_ROOT_RE.search(html):
+        return True
+    if len(_PARAGRAPH_RE.findall(html)) < MIN_STATIC_PARAGRAPHS:
+        return True
+    script_bytes = sum(len(match) for match in _SCRIPT_BLOCK_RE.findall(html))
+    return script_bytes > MAX_STATIC_SCRIPT_RATIO * len(html)
+
+async def fetch_static_page(url: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch a page over plain HTTP, returning None if it needs a browser.
+    Static pages have no screenshot; their inline CSS is read from the HTML later.
+    """
+    try:
+        response = await http_client.get(url, headers=STATIC_FETCH_HEADERS, timeout=10)
+    except httpx.HTTPError as e:
+        logger.info(f"Static fetch failed for {url}: {str(e)}")
+        return None
+    
+    if response.status_code != 200 or "html" not in response.headers.get("content-type", ""):
+        return None
+    if needs_javascript(response.content):
+        return None
+    
+    content = {
+        "html": response.text,
+        "css": "",
+        "screenshot": None
+    }
+    try:
+        await store_cached_page(url, content, response.headers, rendered=False)
+    except Exception as e:
+        logger.warning(f"Failed to cache page {url}: {str(e)}")
+    return content
+
+async def get_page_content(url: str, render: bool = False) -> Optional[Dict[str, Any]]:
     """
     Fetch page content using Playwright with anti-bot measures.
-    Returns HTML content, computed styles, and full page screenshot.
+    Returns HTML content, computed styles, and full page screenshot (JPEG bytes);
+    "css_sources" lists the external stylesheets already included in the CSS.
+    Pages that don't need JavaScript are fetched over plain HTTP instead, without
+    a screenshot, unless `render` is set.
+    Returns None immediately while the host's circuit breaker is open.
     """
     try:
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(
-                headless=True,
-                args=[
-                    "--disable-blink-features=AutomationControlled",
-                    "--disable-features=IsolateOrigins,site-per-process",
-                    "--disable-site-isolation-trials"
-                ]
-            )
-            
-            context = await browser.new_context(
-                viewport=BROWSER_CONFIG["viewport"],
-                user_agent=BROWSER_CONFIG["user_agent"],
-                extra_http_headers=BROWSER_CONFIG["headers"]
-            )
-            
-            # Additional anti-bot measures
-            await context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                });
-            """)
-            
+        cached = await get_cached_page(url, render=render)
+        if cached:
+            return cached
+    except Exception as e:
+        logger.warning(f"Page cache lookup failed for {url}: {str(e)}")
+    
+    host = urlparse(url).netloc
+    breaker = host_breakers[host]
+    if not breaker.allow_request():
+        logger.warning(f"Circuit open for {host}, skipping browser fetch")
+        return None
+    
+    # Every admitted request reports exactly one verdict, or a half-open
+    # breaker would keep waiting for its trial
+    outcome_recorded = False
+    
+    def record_outcome(ok: Optional[bool]):
+        """True if the host answered, False on a host failure, None for no verdict."""
+        nonlocal outcome_recorded
+        if outcome_recorded:
+            return
+        outcome_recorded = True
+        if ok is None:
+            breaker.release_trial()
+        elif ok:
+            breaker.on_success()
+        else:
+            breaker.on_failure()
+    
+    try:
+        return await fetch_page_content(url, host, render, record_outcome)
+    finally:
+        # Local errors (browser, CDP) say nothing about the host
+        record_outcome(None)
+
+async def fetch_page_content(
+    url: str,
+    host: str,
+    render: bool,
+    record_outcome: Callable[[Optional[bool]], None]
+) -> Optional[Dict[str, Any]]:
+    """Fetch a page the breaker has admitted, reporting the host's health through `record_outcome`."""
+    # Most pages don't need a browser at all; try a plain fetch first
+    if not render:
+        await host_buckets[host].acquire()
+        static_content = await fetch_static_page(url)
+        if static_content:
+            record_outcome(True)
+            return static_content
+    
+    try:
+        async with context_pool.acquire() as context:
+            page = await context.new_page()
             try:
-                page = await context.new_page()
-                
                 # Set additional page properties
                 await page.set_extra_http_headers(BROWSER_CONFIG["headers"])
                 
-                # Navigate with retry logic
+                # Track stylesheets as the page adds them so their text can be
+                # read directly over CDP once it has loaded
+                stylesheets: Dict[str, str] = {}
+                try:
+                    cdp = await context.new_cdp_session(page)
+                    cdp.on("CSS.styleSheetAdded", lambda event: track_stylesheet(stylesheets, event["header"]))
+                    cdp.on("CSS.styleSheetRemoved", lambda event: stylesheets.pop(event["styleSheetId"], None))
+                    await cdp.send("DOM.enable")
+                    await cdp.send("CSS.enable")
+                except Exception as e:
+                    logger.warning(f"CDP session unavailable: {str(e)}")
+                    cdp = None
+            
+                # Navigate with retry logic, paced by the host's adaptive token bucket.
+                # Only host-health problems (timeouts, connection errors, 403/429,
+                # 5xx) are retried; any other status means the host is answering
+                bucket = host_buckets[host]
+                response = None
+                host_failed = False
                 max_retries = 3
                 for attempt in range(max_retries):
+                    await bucket.acquire()
                     try:
                         response = await page.goto(
                             url,
-                            wait_until="networkidle",
-                            timeout=30000
+                            wait_until="domcontentloaded",
+                            timeout=15000
                         )
-                        
-                        if not response:
-                            logger.error("No response received from page")
-                            if attempt < max_retries - 1:
-                                await page.wait_for_timeout(2000 * (attempt + 1))
-                                continue
-                            break
-                            
-                        status = response.status
-                        if status == 200:
-                            break
-                            
-                        if status == 403:
-                            logger.warning(f"Received 403 status code (attempt {attempt + 1})")
-                            if attempt < max_retries - 1:
-                                await page.wait_for_timeout(2000 * (attempt + 1))
-                                continue
-                            break
-                            
-                        if status >= 400:
-                            logger.error(f"Received error status code: {status}")
-                            if attempt < max_retries - 1:
-                                await page.wait_for_timeout(2000 * (attempt + 1))
-                                continue
-                            break
-                            
                     except Exception as e:
                         logger.warning(f"Navigation failed (attempt {attempt + 1}): {str(e)}")
+                        bucket.decrease_rate()
+                        host_failed = True
                         if attempt < max_retries - 1:
-                            await page.wait_for_timeout(2000 * (attempt + 1))
                             continue
+                        record_outcome(False)
                         raise
+                    
+                    if not response:
+                        logger.error("No response received from page")
+                        bucket.decrease_rate()
+                        host_failed = True
+                        continue
+                    
+                    status = response.status
+                    if status in (403, 429) or status >= 500:
+                        logger.warning(f"Received {status} status code (attempt {attempt + 1})")
+                        bucket.decrease_rate(parse_retry_after(response.headers.get("retry-after")))
+                        host_failed = True
+                        continue
+                    
+                    host_failed = False
+                    if status == 200:
+                        bucket.increase_rate()
+                    else:
+                        # A 404 and the like is about this URL, not the host
+                        logger.error(f"Received {status} status code for {url}")
+                    break
+                
+                # One verdict per request, however many attempts it took
+                record_outcome(not host_failed)
                 
                 # Check if we got a successful response
                 if not response or response.status != 200:
                     logger.error(f"Failed to load page: Status {response.status if response else 'No response'}")
                     return None
-                
-                # Wait for content to load
-                await page.wait_for_load_state("networkidle")
-                
-                # Take full page screenshot
+            
+                # Give scripts a bounded window to finish rendering
+                await wait_for_page_settle(page)
+            
+                # Take full page screenshot; JPEG keeps long pages to a fraction
+                # of the PNG size and is enough for colors and visual reference
                 screenshot = await page.screenshot(
                     full_page=True,
-                    type='png'
+                    type='jpeg',
+                    quality=SCREENSHOT_JPEG_QUALITY
                 )
-                
-                # Get HTML content
-                html_content = await page.content()
-                
-                # Get computed styles
-                css_content = await page.evaluate("""() => {
-                    const styleSheets = Array.from(document.styleSheets);
-                    return styleSheets
-                        .filter(sheet => {
-                            try {
-                                return sheet.cssRules !== null;
-                            } catch (e) {
-                                return false;
-                            }
-                        })
-                        .map(sheet => {
-                            return Array.from(sheet.cssRules)
-                                .map(rule => rule.cssText)
-                                .join('\\n');
-                        })
-                        .join('\\n');
-                }""")
-                
+            
+                # Get HTML content, minus subtrees none of the extractors read
+                html_content = await page.evaluate(SERIALIZE_HTML_JS)
+            
+                # Get stylesheet text over CDP, falling back to walking document.styleSheets
+                css_content = None
+                css_sources: List[str] = []
+                if cdp and stylesheets:
+                    try:
+                        css_content, css_sources = await get_stylesheet_texts(cdp, stylesheets)
+                    except Exception as e:
+                        logger.warning(f"CDP stylesheet collection failed: {str(e)}")
+                if css_content is None:
+                    css_content = await page.evaluate(COLLECT_CSS_JS)
+            
                 result = {
                     "html": html_content,
                     "css": css_content,
-                    "screenshot": base64.b64encode(screenshot).decode('utf-8')
+                    "css_sources": css_sources,
+                    "screenshot": screenshot
                 }
-                return result
                 
+                try:
+                    await store_cached_page(url, result, response.headers, rendered=True)
+                except Exception as e:
+                    logger.warning(f"Failed to cache page {url}: {str(e)}")
+                return result
+            
             finally:
-                await context.close()
-                await browser.close()
-                
+                # The context goes back to the pool; only the page is closed
+                await page.close()
+            
     except Exception as e:
         logger.error(f"Failed to fetch page content: {str(e)}")
         return None
 
+async def get_pages_content(urls: List[str], concurrency: Optional[int] = None) -> List[Optional[Dict[str, Any]]]:
+    """
+    Fetch several pages concurrently over the shared browser's context pool.
+    Results are in the same order as `urls`; failed pages are None.
+    """
+    if concurrency is None:
+        concurrency = max(1, min(len(urls), (os.cpu_count() or 1) * 2))
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def fetch(url: str) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            return await get_page_content(url)
+    
+    return await asyncio.gather(*(fetch(url) for url in urls))
+
 def is_valid_url(url: str) -> bool:
-    """Validate if the given URL is properly formatted."""
+    """Validate that the given URL is a well-formed http(s) URL."""
+    # Cheap prefix check rejects most malformed input before parsing
+    if not url[:8].lower().startswith(("http://", "https://")):
+        return False
     try:
-        result = urlparse(url)
-        return all([result.scheme, result.netloc])
-    except:
+        return bool(urlparse(url).netloc)
+    except ValueError:
         return False
 
-def extract_title(soup: BeautifulSoup) -> str:
+def normalize_url(url: str) -> str:
+    """Normalize a URL for use as a cache key."""
+    parsed = urlparse(url.strip())
+    return urlunparse((
+        parsed.scheme.lower(),
+        parsed.netloc.lower(),
+        parsed.path or "/",
+        parsed.params,
+        parsed.query,
+        ""
+    ))
+
+@dataclass(slots=True)
+class NodeStats:
+    """An element's tag and classes, with counts of elements below it (excluding itself)."""
+    tag: str
+    classes: str
+    links: int = 0
+    buttons: int = 0
+    images: int = 0
+    headings: int = 0
+    repeated: int = 0  # card/product/item elements
+    repeated_with_images: int = 0  # repeated elements containing an image
+    social_links: int = 0
+
+@dataclass
+class ExtractionBundle:
+    """Everything the DOM extractors need, collected in a single pass over the tree."""
+    title: str = ""
+    css_links: List[str] = field(default_factory=list)
+    style_blocks: List[str] = field(default_factory=list)
+    inline_styles: List[str] = field(default_factory=list)
+    images: List[str] = field(default_factory=list)
+    headings: List[str] = field(default_factory=list)
+    paragraphs: List[str] = field(default_factory=list)
+    buttons: List[str] = field(default_factory=list)
+    semantic_snippets: List[str] = field(default_factory=list)
+    class_values: Set[str] = field(default_factory=set)
+    tag_names: Set[str] = field(default_factory=set)
+    component_candidates: List[NodeStats] = field(default_factory=list)
+
+_HEADING_TAGS = frozenset({'h1', 'h2', 'h3'})
+_SEMANTIC_SNIPPET_TAGS = frozenset({'header', 'main', 'footer', 'nav', 'section'})
+_COMPONENT_TAGS = frozenset({'nav', 'header', 'main', 'section', 'footer', 'div'})
+_REPEATED_CLASS_HINTS = ('card', 'product', 'item')
+MAX_PARAGRAPHS = 10
+
+def collect_all(tree: LexborHTMLParser, base_url: str) -> ExtractionBundle:
+    """Walk the document once, filling every extractor's bucket in document order."""
+    bundle = ExtractionBundle()
+    css_links = {}
+    images = {}
+    paragraphs_seen = 0
+    elements = []
+    
+    for node in tree.root.traverse():
+        tag = node.tag
+        if tag[0] == '-':  # Comments and other non-element nodes
+            continue
+        attributes = node.attributes
+        classes = (attributes.get('class') or '').lower()
+        bundle.tag_names.add(tag)
+        if classes:
+            bundle.class_values.add(classes)
+        style = attributes.get('style')
+        if style:
+            bundle.inline_styles.append(style)
+        
+        if tag in _HEADING_TAGS:
+            if text := node.text().strip():
+                bundle.headings.append(text)
+        elif tag == 'p':
+            # Only the first few paragraphs are considered; skip tiny ones
+            if paragraphs_seen < MAX_PARAGRAPHS:
+                paragraphs_seen += 1
+                if len(text := node.text().strip()) > 20:
+                    bundle.paragraphs.append(text)
+        elif tag == 'button' or (tag == 'a' and 'btn' in classes):
+            if text := node.text().strip():
+                bundle.buttons.append(text)
+        elif tag == 'img':
+            src = attributes.get('src')
+            if src:
+                images[urljoin(base_url, src)] = None
+        elif tag == 'link':
+            href = attributes.get('href')
+            rel = (attributes.get('rel') or '').lower().split()
+            # Print-only stylesheets don't affect the rendered design
+            if (href and 'stylesheet' in rel and
+                (attributes.get('media') or '').strip().lower() != 'print'):
+                css_links[urldefrag(urljoin(base_url, href))[0]] = None
+        elif tag == 'style':
+            if text := node.text():
+                bundle.style_blocks.append(text)
+        elif tag == 'title' and not bundle.title:
+            bundle.title = node.text().strip()
+        
+        if tag in _SEMANTIC_SNIPPET_TAGS:
+            # Keep the tag name and attributes, with a truncated content placeholder
+            attrs = ''.join(
+                f' {name}="{escape(value or "")}"'
+                for name, value in attributes.items()
+            )
+            bundle.semantic_snippets.append(f'<{tag}{attrs}>...</{tag}>')
+        elements.append((node, tag, classes))
+    
+    # Aggregate descendant counts bottom-up so component analysis doesn't
+    # re-walk each candidate's subtree. Reverse document order visits every
+    # child before its parent.
+    pending: Dict[int, NodeStats] = {}
+    candidates = []
+    for node, tag, classes in reversed(elements):
+        stats = pending.pop(node.mem_id, None) or NodeStats(tag, classes)
+        stats.tag, stats.classes = tag, classes
+        if tag in _COMPONENT_TAGS:
+            candidates.append(stats)
+        
+        parent = node.parent
+        if parent is None:
+            continue
+        totals = pending.get(parent.mem_id)
+        if totals is None:
+            totals = pending[parent.mem_id] = NodeStats('', '')
+        is_link = tag == 'a'
+        is_image = tag == 'img'
+        is_repeated = any(hint in classes for hint in _REPEATED_CLASS_HINTS)
+        totals.links += stats.links + is_link
+        totals.buttons += stats.buttons + ((is_link or tag == 'button') and 'btn' in classes)
+        totals.images += stats.images + is_image
+        totals.headings += stats.headings + (tag in _HEADING_TAGS)
+        totals.repeated += stats.repeated + is_repeated
+        totals.repeated_with_images += stats.repeated_with_images + (is_repeated and stats.images > 0)
+        totals.social_links += stats.social_links + (is_link and 'social' in classes)
+    
+    candidates.reverse()
+    bundle.component_candidates = candidates
+    bundle.css_links = list(css_links)
+    bundle.images = list(images)
+    return bundle
+
+def parse_page(html: str, base_url: str) -> ExtractionBundle:
+    """Parse HTML and collect everything the extractors need from it."""
+    tree = LexborHTMLParser(html)
+    # Pages from the plain HTTP fallback still carry scripts and inline SVG
+    tree.strip_tags(list(IGNORED_TAGS), recursive=True)
+    return collect_all(tree, base_url)
+
+def extract_title(bundle: ExtractionBundle) -> str:
     """Extract page title."""
-    title = soup.title.string if soup.title else ""
-    return title.strip() if title else ""
-
-def extract_css_links(soup: BeautifulSoup, base_url: str) -> List[str]:
-    """Extract all CSS stylesheet links."""
-    css_links = []
-    for link in soup.find_all('link', rel='stylesheet'):
-        href = link.get('href')
-        if href:
-            absolute_url = urljoin(base_url, href)
-            css_links.append(absolute_url)
-    return css_links
-
-def extract_css_content(soup: BeautifulSoup, base_url: str) -> str:
+    return bundle.title
+
+def extract_css_links(bundle: ExtractionBundle) -> List[str]:
+    """Extract all CSS stylesheet links, deduplicated and without fragments."""
+    return bundle.css_links
+
+def filter_css_links(css_links: List[str], base_url: str) -> List[str]:
+    """Drop noise stylesheets and keep the most relevant MAX_CSS_LINKS, same-origin first."""
+    base_host = urlparse(base_url).netloc.lower()
+    relevant = [
+        css_url for css_url in css_links
+        if not is_noise_url(css_url)
+        and not urlparse(css_url).path.endswith('.print.css')
+    ]
+    relevant.sort(key=lambda css_url: urlparse(css_url).netloc.lower() != base_host)
+    return relevant[:MAX_CSS_LINKS]
+
+async def extract_css_content(bundle: ExtractionBundle) -> str:
     """Extract and combine all CSS content for analysis."""
-    css_content = []
-    
-    # Get inline styles
-    for style in soup.find_all('style'):
-        if style.string:
-            css_content.append(style.string)
-    
-    # Get external stylesheets
-    for link in soup.find_all('link', rel='stylesheet'):
-        href = link.get('href')
-        if href:
-            absolute_url = urljoin(base_url, href)
-            try:
-                response = requests.get(absolute_url, timeout=10)
-                if response.status_code == 200:
-                    css_content.append(response.text)
-            except:
-                continue
-    
+    # Inline <style> blocks first, then external stylesheets fetched concurrently
+    css_content = list(bundle.style_blocks)
+    css_content.extend(await fetch_stylesheets(bundle.css_links))
     return "\n".join(css_content)
 
-def extract_color_palette(css_content: str) -> List[str]:
-    """Extract color codes from CSS content."""
-    # Match hex colors and rgb/rgba values
-    color_pattern = r'#[0-9a-fA-F]{3,6}|rgb\([^)]+\)|rgba\([^)]+\)'
-    colors = re.findall(color_pattern, css_content)
+async def fetch_stylesheet(css_url: str) -> Optional[str]:
+    """Fetch a single stylesheet, giving up on responses over MAX_STYLESHEET_BYTES."""
+    # Conditional request if we've seen this stylesheet before
+    headers = {}
+    cached = stylesheet_validators.get(css_url)
+    if cached:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
     
-    # Convert colors to hex format for consistency
-    hex_colors = set()
-    for color in colors:
-        try:
-            if color.startswith('#'):
-                hex_colors.add(color.lower())
-            elif color.startswith('rgb'):
-                # Convert rgb/rgba to hex
-                values = re.findall(r'\d+', color)[:3]
-                hex_color = '#{:02x}{:02x}{:02x}'.format(*map(int, values))
-                hex_colors.add(hex_color)
-        except:
+    async with host_semaphores[urlparse(css_url).netloc]:
+        async with http_client.stream("GET", css_url, headers=headers, timeout=10) as response:
+            if response.status_code == 304 and cached:
+                return cached[2]
+            if not response.is_success:
+                return None
+            
+            chunks = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > MAX_STYLESHEET_BYTES:
+                    logger.warning(f"Skipping oversized stylesheet {css_url}")
+                    return None
+                chunks.append(chunk)
+            
+            css_text = b"".join(chunks).decode(response.encoding or "utf-8", errors="replace")
+            etag = response.headers.get("etag")
+            last_modified = response.headers.get("last-modified")
+            if etag or last_modified:
+                stylesheet_validators[css_url] = (etag, last_modified, css_text)
+            return css_text
+
+async def fetch_stylesheets(css_links: List[str]) -> List[str]:
+    """Fetch external stylesheets concurrently, skipping any that fail."""
+    missing = [css_url for css_url in css_links if css_url not in stylesheet_cache]
+    results = await asyncio.gather(
+        *(fetch_stylesheet(css_url) for css_url in missing),
+        return_exceptions=True
+    )
+    
+    for css_url, css_text in zip(missing, results):
+        if isinstance(css_text, Exception) or css_text is None:
+            logger.warning(f"Failed to fetch CSS from {css_url}")
             continue
+        stylesheet_cache[css_url] = css_text
+    
+    return [stylesheet_cache[css_url] for css_url in css_links if css_url in stylesheet_cache]
+
+def extract_color_palette(scan: CssScan) -> List[str]:
+    """Extract color codes from scanned CSS content."""
+    # Hex and rgb/rgba values, normalized to hex and deduplicated in order
+    hex_colors = dict.fromkeys(scan.colors)
     
     # Return top colors (limit to reasonable number)
     return list(hex_colors)[:10]
 
-def extract_fonts_from_css(css_content: str) -> Set[str]:
-    """Extract font families from CSS content."""
+def extract_fonts_from_css(scan: CssScan) -> Set[str]:
+    """Extract font families from scanned CSS content."""
     fonts = set()
-    # Match font-family declarations, including those with multiple fonts
-    font_pattern = r'font-family\s*:\s*([^;}]+)[;}]'
-    matches = re.findall(font_pattern, css_content, re.IGNORECASE)
-    
-    for match in matches:
+    # font-family declarations, including those with multiple fonts
+    for match in scan.font_families:
         # Split font list and clean each font name
         for font in match.split(','):
             font = font.strip().strip("'").strip('"')
             # Filter out generic families and CSS keywords
-            if font.lower() not in {'inherit', 'initial', 'unset', 'serif', 'sans-serif', 'monospace', 'cursive', 'fantasy', 'system-ui'}:
+            if font.lower() not in _GENERIC_FAMILIES:
                 fonts.add(font)
     
     return fonts
 
-def extract_fonts_from_inline_styles(soup: BeautifulSoup) -> Set[str]:
+def extract_fonts_from_inline_styles(bundle: ExtractionBundle) -> Set[str]:
     """Extract fonts from inline style attributes."""
     fonts = set()
     
-    # Find all elements with style attribute
-    for element in soup.find_all(style=True):
-        style = element['style']
+    for style in bundle.inline_styles:
         if 'font-family' in style.lower():
             # Extract fonts from inline style
-            matches = re.findall(r'font-family\s*:\s*([^;]+)', style, re.IGNORECASE)
+            matches = _FONT_FAMILY_RE.findall(style)
             for match in matches:
                 for font in match.split(','):
                     font = font.strip().strip("'").strip('"')
-                    if font.lower() not in {'inherit', 'initial', 'unset', 'serif', 'sans-serif', 'monospace', 'cursive', 'fantasy', 'system-ui'}:
+                    if font.lower() not in _GENERIC_FAMILIES:
                         fonts.add(font)
     
     return fonts
 
-def extract_colors_from_css(css_content: str) -> List[str]:
-    """Extract color values from CSS content."""
+def extract_colors_from_css(scan: CssScan) -> List[str]:
+    """Extract color values from scanned CSS content."""
     colors = set()
     
-    # Match various color formats
-    color_patterns = [
-        (r'#[0-9a-fA-F]{3}\b', lambda x: x),  # #RGB
-        (r'#[0-9a-fA-F]{6}\b', lambda x: x),  # #RRGGBB
-        (r'rgb\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)', 
-         lambda x: '#{:02x}{:02x}{:02x}'.format(*map(int, x.groups()))),  # rgb()
-        (r'rgba\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*[\d.]+\s*\)',
-         lambda x: '#{:02x}{:02x}{:02x}'.format(*map(int, x.groups())))  # rgba()
-    ]
-    
-    # CSS properties that commonly contain colors
-    color_properties = [
-        'color:', 'background-color:', 'border-color:', 
-        'box-shadow:', 'text-shadow:', 'outline-color:',
-        'border:', 'background:', 'border-top-color:',
-        'border-right-color:', 'border-bottom-color:',
-        'border-left-color:'
-    ]
-    
-    # Extract colors from each property
-    for prop in color_properties:
-        prop_pattern = f'{prop}[^;}}]+'
-        matches = re.finditer(prop_pattern, css_content, re.IGNORECASE)
-        for match in matches:
-            value = match.group()
-            for pattern, converter in color_patterns:
-                color_matches = re.finditer(pattern, value)
-                for color_match in color_matches:
-                    try:
-                        color = converter(color_match)
-                        colors.add(color.lower())
-                    except:
-                        continue
+    # Parse the value of each color-bearing declaration found by the scan
+    for value in scan.color_values:
+        colors.update(iter_hex_colors(value))
     
     # Sort colors by frequency and return top 8
     return sorted(list(colors))[:8]
 
-def extract_images(soup: BeautifulSoup, base_url: str) -> List[str]:
+def extract_images(bundle: ExtractionBundle) -> List[str]:
     """Extract image URLs from img tags."""
-    images = set()
-    
-    for img in soup.find_all('img'):
-        src = img.get('src')
-        if src:
-            absolute_url = urljoin(base_url, src)
-            images.add(absolute_url)
-    
     # Return top 10 images
-    return list(images)[:10]
+    return bundle.images[:10]
 
-def extract_text_snippets(soup: BeautifulSoup) -> Dict[str, List[str]]:
+def extract_text_snippets(bundle: ExtractionBundle) -> Dict[str, List[str]]:
     """Extract organized text content."""
-    # Extract headings (h1-h3)
-    headings = [h.get_text().strip() 
-               for h in soup.find_all(['h1', 'h2', 'h3']) 
-               if h.get_text().strip()]
-    
-    # Extract first 10 meaningful paragraphs
-    paragraphs = [p.get_text().strip() 
-                 for p in soup.find_all('p', limit=10) 
-                 if len(p.get_text().strip()) > 20]  # Filter out tiny paragraphs
-    
-    # Extract button text
-    buttons = []
-    for btn in soup.find_all(['button', 'a']):
-        if (btn.name == 'a' and 
-            any(c for c in btn.get('class', []) if 'btn' in c.lower())):
-            text = btn.get_text().strip()
-            if text:
-                buttons.append(text)
-        elif btn.name == 'button':
-            text = btn.get_text().strip()
-            if text:
-                buttons.append(text)
-    
     return {
-        "headings": headings,
-        "paragraphs": paragraphs,
-        "buttons": buttons
+        "headings": bundle.headings,
+        "paragraphs": bundle.paragraphs,
+        "buttons": bundle.buttons
     }
 
-def extract_layout_hints(soup: BeautifulSoup) -> List[str]:
+# Class-name keywords that hint at common page sections, in reporting order
+_LAYOUT_CLASS_HINTS = {
+    'hero': ['hero', 'banner', 'jumbotron'],
+    'product-grid': ['products', 'grid', 'cards'],
+    'features': ['features', 'services'],
+    'testimonials': ['testimonials', 'reviews'],
+    'contact': ['contact', 'get-in-touch'],
+    'blog': ['blog', 'posts', 'articles']
+}
+_CLASS_TO_COMPONENT = {
+    keyword: component
+    for component, keywords in _LAYOUT_CLASS_HINTS.items()
+    for keyword in keywords
+}
+# All keywords in one alternation, longest first so none shadows a longer one
+_LAYOUT_CLASS_RE = re.compile('|'.join(
+    re.escape(keyword) for keyword in sorted(_CLASS_TO_COMPONENT, key=len, reverse=True)
+))
+
+def extract_layout_hints(bundle: ExtractionBundle) -> List[str]:
     """Infer layout components from semantic tags and class names."""
     layout = []
     
     # Check semantic tags
-    if soup.find('nav'):
+    if 'nav' in bundle.tag_names:
         layout.append('navbar')
-    if soup.find('header'):
+    if 'header' in bundle.tag_names:
         layout.append('header')
-    if soup.find('footer'):
+    if 'footer' in bundle.tag_names:
         layout.append('footer')
     
-    # Check common class names
-    common_components = {
-        'hero': ['hero', 'banner', 'jumbotron'],
-        'product-grid': ['products', 'grid', 'cards'],
-        'features': ['features', 'services'],
-        'testimonials': ['testimonials', 'reviews'],
-        'contact': ['contact', 'get-in-touch'],
-        'blog': ['blog', 'posts', 'articles']
+    # Check common class names: one scan over the page's distinct class attributes
+    found = {
+        _CLASS_TO_COMPONENT[match.group()]
+        for match in _LAYOUT_CLASS_RE.finditer('\n'.join(bundle.class_values))
     }
-    
-    for component, classes in common_components.items():
-        for cls in classes:
-            if soup.find(class_=lambda x: x and cls.lower() in x.lower()):
-                layout.append(component)
-                break
+    layout.extend(component for component in _LAYOUT_CLASS_HINTS if component in found)
     
     return layout
 
-def extract_raw_html_snippet(soup: BeautifulSoup) -> str:
+def extract_raw_html_snippet(bundle: ExtractionBundle) -> str:
     """Extract main semantic layout tags with truncated content."""
-    # Find all semantic layout tags
-    semantic_tags = soup.find_all(['header', 'main', 'footer', 'nav', 'section'])
-    
-    # Create a new soup with just these tags
-    layout_soup = BeautifulSoup('<div></div>', 'html.parser')
-    layout_div = layout_soup.div
-    
-    for tag in semantic_tags:
-        # Create a new tag with the same name and attributes
-        new_tag = layout_soup.new_tag(tag.name)
-        new_tag.attrs = tag.attrs
-        
-        # Add truncated content placeholder
-        new_tag.string = '...'
-        layout_div.append(new_tag)
-    
-    return str(layout_div)
+    return f"<div>{''.join(bundle.semantic_snippets)}</div>"
 
 def capture_screenshot(url: str) -> Optional[str]:
     """Capture full page screenshot using Playwright."""
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
-            page = browser.new_page()
+        page = get_sync_browser().new_page()
+        try:
             page.goto(url, wait_until='networkidle')
             screenshot = page.screenshot(full_page=True)
-            browser.close()
             return base64.b64encode(screenshot).decode('utf-8')
+        finally:
+            page.close()
     except:
         return None
 
 def get_rendered_html(url: str) -> Optional[str]:
     """Get JavaScript-rendered HTML content using Playwright."""
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
-            page = browser.new_page()
+        page = get_sync_browser().new_page()
+        try:
+            # Only the markup is needed, so skip media, fonts and trackers
+            page.route("**/*", lambda route: (
+                route.abort()
+                if should_block_request(route.request.resource_type, route.request.url)
+                else route.continue_()
+            ))
             page.goto(url, wait_until='networkidle')
-            content = page.content()
-            browser.close()
-            return content
+            return page.content()
+        finally:
+            page.close()
     except:
         return None 
 
@@ -542,34 +1024,20 @@ class Component:
     description: str
     confidence: float
 
-def analyze_component(element: Tag) -> Optional[Component]:
-    """Analyze a DOM element to determine if it's a recognized component."""
-    
-    def get_element_stats(el: Tag) -> Dict:
-        """Get statistics about an element's contents."""
-        return {
-            'links': len(el.find_all('a')),
-            'buttons': len(el.find_all(['button', 'a'], class_=lambda x: x and 'btn' in x.lower())),
-            'images': len(el.find_all('img')),
-            'headings': len(el.find_all(['h1', 'h2', 'h3'])),
-            'text': len(el.get_text().strip()),
-            'classes': el.get('class', [])
-        }
-    
-    stats = get_element_stats(element)
-    tag_name = element.name
-    classes = ' '.join(element.get('class', [])).lower()
+def analyze_component(stats: NodeStats) -> Optional[Component]:
+    """Analyze a DOM element's precomputed stats to determine if it's a recognized component."""
+    tag_name = stats.tag
+    classes = stats.classes
     
     # Navbar detection
     if (tag_name == 'nav' or 
         'nav' in classes or 
         'header' in classes or 
         'navbar' in classes):
-        links = len(element.find_all('a'))
-        has_logo = bool(element.find('img'))
+        has_logo = stats.images > 0
         return Component(
             type='navbar',
-            description=f"Navbar with {links} navigation links" + (" and logo" if has_logo else ""),
+            description=f"Navbar with {stats.links} navigation links" + (" and logo" if has_logo else ""),
             confidence=0.9 if tag_name == 'nav' else 0.7
         )
     
@@ -577,33 +1045,32 @@ def analyze_component(element: Tag) -> Optional[Component]:
     if ('hero' in classes or 
         'banner' in classes or 
         'jumbotron' in classes or
-        (tag_name == 'header' and stats['headings'] > 0)):
-        cta_count = stats['buttons']
-        has_image = bool(element.find('img'))
+        (tag_name == 'header' and stats.headings > 0)):
+        cta_count = stats.buttons
+        has_image = stats.images > 0
         return Component(
             type='hero',
-            description=f"Hero section with {stats['headings']} heading(s)" + 
+            description=f"Hero section with {stats.headings} heading(s)" + 
                        (f" and {cta_count} call-to-action button(s)" if cta_count else "") +
                        (" featuring hero image" if has_image else ""),
             confidence=0.8
         )
     
     # Product/Card grid detection
-    repeated_elements = element.find_all(class_=lambda x: x and any(term in str(x).lower() for term in ['card', 'product', 'item', 'grid-item']))
-    if len(repeated_elements) >= 3:
+    if stats.repeated >= 3:
         return Component(
             type='product-grid',
-            description=f"Grid of {len(repeated_elements)} product/content cards" +
-                       (" with images" if any(el.find('img') for el in repeated_elements) else ""),
+            description=f"Grid of {stats.repeated} product/content cards" +
+                       (" with images" if stats.repeated_with_images else ""),
             confidence=0.7
         )
     
     # Footer detection
     if (tag_name == 'footer' or 'footer' in classes):
-        social_links = len(element.find_all('a', class_=lambda x: x and 'social' in str(x).lower()))
+        social_links = stats.social_links
         return Component(
             type='footer',
-            description=f"Footer with {stats['links']} links" +
+            description=f"Footer with {stats.links} links" +
                        (f" including {social_links} social media links" if social_links else ""),
             confidence=0.9 if tag_name == 'footer' else 0.7
         )
@@ -611,16 +1078,16 @@ def analyze_component(element: Tag) -> Optional[Component]:
     # Feature section detection
     if ('features' in classes or 
         'services' in classes or
-        (tag_name == 'section' and stats['headings'] > 0)):
+        (tag_name == 'section' and stats.headings > 0)):
         return Component(
             type='features',
-            description=f"Feature section with {stats['headings']} headings and {stats['images']} images",
+            description=f"Feature section with {stats.headings} headings and {stats.images} images",
             confidence=0.6
         )
     
     return None
 
-def extract_component_descriptions(soup: BeautifulSoup) -> Tuple[List[str], List[str]]:
+def extract_component_descriptions(bundle: ExtractionBundle) -> Tuple[List[str], List[str]]:
     """
     Extract component descriptions and layout structure.
     Returns (component_descriptions, layout)
@@ -630,8 +1097,8 @@ def extract_component_descriptions(soup: BeautifulSoup) -> Tuple[List[str], List
     seen_types = set()
     
     # Look for main semantic sections
-    for element in soup.find_all(['nav', 'header', 'main', 'section', 'footer', 'div']):
-        component = analyze_component(element)
+    for stats in bundle.component_candidates:
+        component = analyze_component(stats)
         if component and component.confidence >= 0.6:
             # Add to descriptions if we have meaningful info
             if component.description and component.type not in seen_types:
@@ -644,14 +1111,40 @@ def extract_component_descriptions(soup: BeautifulSoup) -> Tuple[List[str], List
     
     return components, layout 
 
-def process_screenshot_for_llm(screenshot_base64: str) -> Dict[str, Any]:
+# Screenshots are downsampled to fit this box before color analysis
+SCREENSHOT_SAMPLE_SIZE = (256, 256)
+
+# Bounds for the copy of the screenshot passed on for LLM reference
+LLM_IMAGE_MAX_SIZE = (1024, 4096)
+
+def get_dominant_colors(image: Image.Image, count: int = 5) -> List[str]:
+    """Return the most common colors of an RGB image, quantized to 4 bits per channel."""
+    pixels = np.asarray(image, dtype=np.uint8) >> 4
+    codes = (
+        (pixels[..., 0].astype(np.uint16) << 8) |
+        (pixels[..., 1].astype(np.uint16) << 4) |
+        pixels[..., 2]
+    )
+    values, counts = np.unique(codes.ravel(), return_counts=True)
+    
+    # Pick the top colors without fully sorting the histogram
+    if len(values) > count:
+        top = np.argpartition(-counts, count)[:count]
+        values, counts = values[top], counts[top]
+    values = values[np.argsort(-counts, kind='stable')]
+    
+    # Scale each 4-bit channel back to 0-255 (0xf -> 0xff)
+    return [
+        HEX_COLOR_FORMAT(((code >> 8) & 0xf) * 17, ((code >> 4) & 0xf) * 17, (code & 0xf) * 17)
+        for code in values.tolist()
+    ]
+
+def process_screenshot_for_llm(screenshot: bytes) -> Dict[str, Any]:
     """
     Process screenshot for LLM consumption, extracting relevant visual information.
     """
     try:
-        # Decode base64 image
-        image_data = base64.b64decode(screenshot_base64)
-        image = Image.open(io.BytesIO(image_data))
+        image = Image.open(io.BytesIO(screenshot))
         
         # Get image dimensions
         width, height = image.size
@@ -660,13 +1153,14 @@ def process_screenshot_for_llm(screenshot_base64: str) -> Dict[str, Any]:
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
-        # Get dominant colors
-        colors = image.getcolors(maxcolors=256)
-        if colors:
-            colors.sort(reverse=True)
-            dominant_colors = [webcolors.rgb_to_hex(color[1]) for color in colors[:5]]
-        else:
-            dominant_colors = []
+        # Downscale and re-encode the copy handed to the LLM
+        image.thumbnail(LLM_IMAGE_MAX_SIZE, Image.Resampling.BILINEAR)
+        llm_image = io.BytesIO()
+        image.save(llm_image, format='JPEG', quality=SCREENSHOT_JPEG_QUALITY)
+        
+        # Downsample further so the color histogram costs the same for any page length
+        image.thumbnail(SCREENSHOT_SAMPLE_SIZE, Image.Resampling.BILINEAR)
+        dominant_colors = get_dominant_colors(image)
         
         return {
             "dimensions": {
@@ -674,7 +1168,8 @@ def process_screenshot_for_llm(screenshot_base64: str) -> Dict[str, Any]:
                 "height": height
             },
             "dominant_colors": dominant_colors,
-            "base64_image": screenshot_base64
+            # Raw JPEG bytes; base64 encoding is left to the API layer
+            "image": llm_image.getvalue()
         }
     except Exception as e:
         logger.error(f"Failed to process screenshot: {str(e)}")
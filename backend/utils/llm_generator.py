@@ -1,35 +1,288 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Callable, Iterable, List, Optional, Protocol, Tuple
 import google.generativeai as genai
-import json
+from google.api_core import exceptions as google_exceptions
+import asyncio
+import diskcache
+import hashlib
+import heapq
 import logging
+import numpy as np
+import orjson
+import os
+import random
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 import re
-import requests
+from .rate_limit import TokenBucket
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by the application entrypoint
 logger = logging.getLogger(__name__)
 
 # Global variables
 GEMINI_API_KEY = None  # Will be set by configure_gemini
-model = None  # Will be set by configure_gemini
+models: Dict[str, genai.GenerativeModel] = {}  # One shared model per name, reused across requests
 
-@dataclass
+# Gemini call limits for the whole deployment; requests per minute should match
+# the account's quota
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_MAX_ATTEMPTS = 5
+GEMINI_BACKOFF_BASE = 1.0  # seconds
+GEMINI_BACKOFF_MAX = 30.0  # seconds
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))  # seconds to the first chunk, per attempt
+GEMINI_CHUNK_TIMEOUT = 30.0  # seconds allowed between streamed chunks
+
+# Each worker process enforces its share of the limits above; WEB_CONCURRENCY is
+# the worker count (also read by uvicorn for --workers)
+WORKER_COUNT = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+WORKER_MAX_CONCURRENCY = max(1, GEMINI_MAX_CONCURRENCY // WORKER_COUNT)
+WORKER_REQUESTS_PER_MINUTE = GEMINI_REQUESTS_PER_MINUTE / WORKER_COUNT
+
+# Quota and overload responses that are worth retrying after a pause
+RETRYABLE_GEMINI_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable)
+
+# Bounds in-flight generations and paces their starts so bursts queue instead of
+# tripping 429s; the bucket slows down further whenever Gemini throttles
+gemini_semaphore = asyncio.Semaphore(WORKER_MAX_CONCURRENCY)
+gemini_bucket = TokenBucket(
+    capacity=WORKER_MAX_CONCURRENCY,
+    refill_rate=WORKER_REQUESTS_PER_MINUTE / 60,
+    min_rate=WORKER_REQUESTS_PER_MINUTE / 600,
+    max_rate=WORKER_REQUESTS_PER_MINUTE / 60
+)
+
+@dataclass(slots=True, frozen=True)
 class WebsiteCode:
     html: str
     css: str
     error: Optional[str] = None
 
-def configure_gemini(api_key: str):
-    """Configure Gemini with API key."""
-    global GEMINI_API_KEY, model
+# Shared result for output that contained no HTML or CSS
+_EMPTY = WebsiteCode(html="", css="")
+
+class CacheBackend(Protocol):
+    """Storage for cached generations; a shared store (e.g. Redis) can implement this."""
+
+    async def get(self, key: str) -> Optional[Dict[str, str]]: ...
+
+    async def set(self, key: str, value: Dict[str, str], ttl: int) -> None: ...
+
+class MemoryCacheBackend:
+    """In-process LRU backend with per-entry expiry."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, Tuple[float, Dict[str, str]]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Dict[str, str], ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+class DiskCacheBackend:
+    """Persistent backend on diskcache (SQLite), so generations survive restarts."""
+
+    def __init__(self, directory: str, size_limit: int = 2**30):
+        self._cache = diskcache.Cache(directory, size_limit=size_limit)
+
+    async def get(self, key: str) -> Optional[Dict[str, str]]:
+        return await asyncio.to_thread(self._cache.get, key)
+
+    async def set(self, key: str, value: Dict[str, str], ttl: int) -> None:
+        await asyncio.to_thread(self._cache.set, key, value, expire=ttl)
+
+class TieredCacheBackend:
+    """Memory first, then disk; disk hits are promoted and writes go to both."""
+
+    def __init__(self, memory: CacheBackend, disk: CacheBackend, ttl: int = 86400):
+        self.memory = memory
+        self.disk = disk
+        self.ttl = ttl  # lifetime of entries promoted from disk
+
+    async def get(self, key: str) -> Optional[Dict[str, str]]:
+        value = await self.memory.get(key)
+        if value is None:
+            value = await self.disk.get(key)
+            if value is not None:
+                await self.memory.set(key, value, ttl=self.ttl)
+        return value
+
+    async def set(self, key: str, value: Dict[str, str], ttl: int) -> None:
+        await self.memory.set(key, value, ttl=ttl)
+        await self.disk.set(key, value, ttl=ttl)
+
+class LLMCache:
+    """Generated code keyed by a hash of the model and prompt, with hit/miss counters."""
+
+    LOG_EVERY = 100  # log the hit rate every this many lookups
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: int = 86400):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(model_name: str, prompt: str) -> str:
+        """Stable hash of the canonicalized model and prompt."""
+        payload = orjson.dumps({"model": model_name, "prompt": prompt}, option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(payload).hexdigest()
+
+    async def get(self, key: str) -> Optional[WebsiteCode]:
+        value = await self.backend.get(key)
+        self.stats["hits" if value is not None else "misses"] += 1
+        lookups = self.stats["hits"] + self.stats["misses"]
+        if lookups % self.LOG_EVERY == 0:
+            logger.info("LLM cache: %d/%d hits", self.stats["hits"], lookups)
+        if value is None:
+            return None
+        return WebsiteCode(html=value["html"], css=value["css"])
+
+    async def set(self, key: str, code: WebsiteCode) -> None:
+        # Only complete generations are worth serving again
+        if code.error or not code.html or not code.css:
+            return
+        await self.backend.set(key, {"html": code.html, "css": code.css}, ttl=self.ttl)
+
+# Generated sites persisted across restarts (and pre-warmed by warmup.py)
+GENERATION_CACHE_DIR = os.getenv("GENERATION_CACHE_DIR", ".generation_cache")
+
+# Shared across requests so identical prompts skip the Gemini round trip
+llm_cache = LLMCache(TieredCacheBackend(MemoryCacheBackend(), DiskCacheBackend(GENERATION_CACHE_DIR)))
+
+# Gemini calls currently in flight, keyed like llm_cache
+inflight_generations: Dict[str, "asyncio.Task[WebsiteCode]"] = {}
+
+# Design context fields that shape the generated site; volatile ones are left out
+SEMANTIC_CONTEXT_FIELDS = ("title", "color_palette", "fonts", "layout", "component_descriptions", "text_snippets")
+EMBEDDING_MODEL = "models/text-embedding-004"
+MAX_EMBEDDING_CHARS = 8000
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_URL_QUERY_RE = re.compile(r'(https?://[^\s"?#]+)[?#][^\s"]*')
+
+def canonicalize_design_context(design_context: Dict[str, Any]) -> str:
+    """Stable text for a design context: relevant fields only, URLs without query strings, collapsed whitespace."""
+    relevant = {key: design_context.get(key) for key in SEMANTIC_CONTEXT_FIELDS}
+    text = orjson.dumps(relevant, option=orjson.OPT_SORT_KEYS).decode()
+    return _WHITESPACE_RE.sub(" ", _URL_QUERY_RE.sub(r"\1", text))
+
+def layout_hash(design_context: Dict[str, Any]) -> str:
+    """Hash of the layout subtree; a semantic hit must match it exactly."""
+    return hashlib.sha256(orjson.dumps(design_context.get("layout"), option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+class SemanticCache:
+    """Generated code for near-duplicate design contexts, matched by embedding cosine similarity.
+
+    Exact prompt matches are handled by llm_cache; this catches contexts that differ
+    only in volatile details. A hit also requires an identical layout so a similar
+    page with a different structure is never served someone else's site, and the
+    same (model, prompt style) the code was generated with.
+    """
+
+    def __init__(self, threshold: float = 0.97, max_entries: int = 1024):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0}
+        self._keys: List[str] = []
+        self._layouts: List[str] = []
+        self._variants: List[Tuple[str, str]] = []  # (model name, prompt style)
+        self._codes: List[WebsiteCode] = []
+        self._vectors = np.empty((0, 0), dtype=np.float32)  # unit-normalized rows
+
+    async def embed(self, design_context: Dict[str, Any]) -> np.ndarray:
+        """Unit-normalized embedding of the canonicalized design context."""
+        text = canonicalize_design_context(design_context)[:MAX_EMBEDDING_CHARS]
+        # The SDK's embedding call is blocking
+        result = await asyncio.to_thread(
+            genai.embed_content, model=EMBEDDING_MODEL, content=text, task_type="semantic_similarity"
+        )
+        vector = np.asarray(result["embedding"], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, vector: np.ndarray, layout: str, variant: Tuple[str, str]) -> Optional[WebsiteCode]:
+        """Return the most similar code with the same layout and variant, if it clears the threshold."""
+        code = None
+        eligible = np.fromiter(
+            (entry_layout == layout and entry_variant == variant
+             for entry_layout, entry_variant in zip(self._layouts, self._variants)),
+            dtype=bool,
+            count=len(self._codes)
+        )
+        if eligible.any():
+            scores = np.where(eligible, self._vectors @ vector, -np.inf)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                code = self._codes[best]
+        self.stats["hits" if code is not None else "misses"] += 1
+        return code
+
+    def add(self, key: str, vector: np.ndarray, layout: str, variant: Tuple[str, str], code: WebsiteCode):
+        """Remember a complete generation, evicting the oldest past max_entries."""
+        if code.error or not code.html or not code.css or key in self._keys:
+            return
+        if not len(self._codes):
+            self._vectors = vector[np.newaxis, :]
+        else:
+            self._vectors = np.vstack((self._vectors[-(self.max_entries - 1):], vector))
+        self._keys = (self._keys + [key])[-self.max_entries:]
+        self._layouts = (self._layouts + [layout])[-self.max_entries:]
+        self._variants = (self._variants + [variant])[-self.max_entries:]
+        self._codes = (self._codes + [code])[-self.max_entries:]
+
+# Set by enable_semantic_cache; off unless the app opts in
+semantic_cache: Optional[SemanticCache] = None
+
+def enable_semantic_cache(threshold: float = 0.97):
+    """Turn on embedding-based matching of near-duplicate design contexts."""
+    global semantic_cache
+    semantic_cache = SemanticCache(threshold=threshold)
+
+def configure_gemini(api_key: str, model_names: Iterable[str] = ("gemini-2.0-flash-exp",)):
+    """Configure Gemini with API key and build the given models up front."""
+    global GEMINI_API_KEY
     GEMINI_API_KEY = api_key
+    # The default transport is gRPC (grpc_asyncio for the async calls used here),
+    # multiplexing concurrent generations over one HTTP/2 connection; don't pass
+    # transport="rest", and a single explicit value would also be applied to the
+    # async client, which needs its own asyncio transport
     genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-2.0-flash-exp")
+    models.clear()
+    for model_name in model_names:
+        models[model_name] = genai.GenerativeModel(model_name)
 
-def create_generation_prompt(design_context: Dict[str, Any]) -> str:
-    """Create a detailed prompt for Gemini to generate website code."""
-    return f"""You are an expert front-end web developer tasked with recreating a static HTML and CSS version of a web page, using a structured design context provided to you.
+def get_model(model_name: str) -> Optional[genai.GenerativeModel]:
+    """Return the shared model for a name, building it on first use."""
+    if not GEMINI_API_KEY:
+        return None
+    if model_name not in models:
+        models[model_name] = genai.GenerativeModel(model_name)
+    return models[model_name]
+
+async def warmup_gemini():
+    """Open the API channel for each configured model before the first real request."""
+    for model_name, model in list(models.items()):
+        try:
+            # Counting tokens primes the connection without paying for a generation
+            await model.count_tokens_async("ping")
+        except Exception as e:
+            logger.warning("Gemini warmup failed for %s: %s", model_name, e)
+
+# Static instructions lead each prompt so the provider can reuse the cached
+# prefix; only the design context that follows changes between calls
+GENERATION_PROMPT_PREFIX = """You are an expert front-end web developer tasked with recreating a static HTML and CSS version of a web page, using a structured design context provided to you.
 
 Your output must:
 - Reproduce the layout and visual style described as closely as possible.
@@ -44,111 +297,311 @@ Only output the complete HTML file — do not include comments, explanations, or
 Below is the structured design context for a webpage. Use this data to generate a full static HTML + CSS clone.
 
 Design Context:
-{json.dumps(design_context, indent=2)}"""
+"""
 
-async def generate_website_code(design_context: Dict[str, Any], model_name: str = "gemini-2.0-flash-exp") -> WebsiteCode:
-    """
-    Generate website code using Gemini Pro based on design context.
+WEBSITE_PROMPT_PREFIX = """
+    Create a modern, responsive website clone based on the design context at the end of this prompt.
+
+    Requirements:
+    1. Generate clean, semantic HTML5 markup
+    2. Use modern CSS3 features for styling
+    3. Ensure responsive design that works on all devices
+    4. Match the original layout and design as closely as possible
+    5. Use the provided color palette and fonts
+    6. Implement proper accessibility features
+    7. Optimize for performance
+    
+    Please provide the complete HTML and CSS code for the cloned website.
+
+    Design Context:
     """
-    try:
-        if not model:
-            return WebsiteCode(
-                html="",
-                css="",
-                error="Gemini model not initialized"
-            )
 
-        # Extract screenshot information
-        screenshot_info = design_context.get("screenshot", {})
-        screenshot_prompt = ""
-        if screenshot_info:
-            screenshot_prompt = f"""
-            Visual Reference:
-            - Page dimensions: {screenshot_info.get('dimensions', {}).get('width')}x{screenshot_info.get('dimensions', {}).get('height')} pixels
-            - Dominant colors: {', '.join(screenshot_info.get('dominant_colors', []))}
-            - Full page screenshot is available for reference
-            """
+# Longest text snippets of each kind kept in a prompt
+MAX_PROMPT_SNIPPETS = 50
 
-        # Construct the prompt
-        prompt = f"""
-        Create a modern, responsive website clone based on the following design context:
+_EMPTY_VALUES = (None, "", [], {})
 
-        {screenshot_prompt}
+def _compact_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        compact = ((key, _compact_value(item)) for key, item in value.items() if not isinstance(item, bytes))
+        return {key: item for key, item in compact if item not in _EMPTY_VALUES}
+    if isinstance(value, (list, tuple)):
+        compact = (_compact_value(item) for item in value if not isinstance(item, bytes))
+        return [item for item in compact if item not in _EMPTY_VALUES]
+    if isinstance(value, str) and value.startswith("data:"):
+        # Inline payloads can't be reproduced by the model; a short stable stand-in suffices
+        return f"data:{hashlib.blake2b(value.encode(), digest_size=8).hexdigest()}"
+    return value
 
-        Design Elements:
-        - Title: {design_context.get('title', '')}
-        - Color Palette: {', '.join(design_context.get('color_palette', []))}
-        - Fonts: {', '.join(design_context.get('fonts', []))}
-        
-        Layout Structure:
-        {json.dumps(design_context.get('layout', []), indent=2)}
-        
-        Component Descriptions:
-        {json.dumps(design_context.get('component_descriptions', []), indent=2)}
+def _top_snippets(snippets: List[str]) -> List[str]:
+    if len(snippets) <= MAX_PROMPT_SNIPPETS:
+        return snippets
+    keep = set(heapq.nlargest(MAX_PROMPT_SNIPPETS, range(len(snippets)), key=lambda i: len(snippets[i])))
+    return [snippet for i, snippet in enumerate(snippets) if i in keep]
+
+def _compact_context(design_context: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop empty values and binary data, stub inline data: URLs and cap text snippets (in page order)."""
+    context = _compact_value(design_context)
+    snippets = context.get("text_snippets")
+    if isinstance(snippets, dict):
+        context["text_snippets"] = {kind: _top_snippets(values) for kind, values in snippets.items()}
+    return context
+
+def dump_prompt_json(value: Any) -> str:
+    """Serialize prompt data as compact JSON with sorted keys, so equal contexts give equal prompts."""
+    return orjson.dumps(value, option=orjson.OPT_SORT_KEYS).decode()
+
+def create_generation_prompt(design_context: Dict[str, Any]) -> str:
+    """Create a detailed prompt for Gemini to generate website code."""
+    return GENERATION_PROMPT_PREFIX + dump_prompt_json(_compact_context(design_context))
+
+def create_website_prompt(design_context: Dict[str, Any]) -> str:
+    """Create the website clone prompt from extracted design context."""
+    design_context = _compact_context(design_context)
+    
+    # Extract screenshot information
+    screenshot_info = design_context.get("screenshot", {})
+    screenshot_prompt = ""
+    if screenshot_info:
+        screenshot_prompt = f"""
+        Visual Reference:
+        - Page dimensions: {screenshot_info.get('dimensions', {}).get('width')}x{screenshot_info.get('dimensions', {}).get('height')} pixels
+        - Dominant colors: {', '.join(screenshot_info.get('dominant_colors', []))}
+        - Full page screenshot is available for reference
+        """
+
+    return WEBSITE_PROMPT_PREFIX + f"""{screenshot_prompt}
+
+    Design Elements:
+    - Title: {design_context.get('title', '')}
+    - Color Palette: {', '.join(design_context.get('color_palette', []))}
+    - Fonts: {', '.join(design_context.get('fonts', []))}
+    
+    Layout Structure:
+    {dump_prompt_json(design_context.get('layout', []))}
+    
+    Component Descriptions:
+    {dump_prompt_json(design_context.get('component_descriptions', []))}
+    
+    Text Content:
+    {dump_prompt_json(design_context.get('text_snippets', {}))}
+    
+    Original HTML Structure:
+    {design_context.get('raw_html_snippet', '')}
+    """
+
+# Prompt builders selectable by name through the prompt_style argument
+PROMPT_BUILDERS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "website": create_website_prompt,
+    "detailed": create_generation_prompt,
+}
+
+# Markdown fence around generated HTML, located with str.find rather than regex
+HTML_FENCE = "```html\n"
+HTML_END = "</html>"
+_STYLE_OPEN_RE = re.compile(r'<style\b[^>]*>', re.IGNORECASE)
+FENCE_END = "\n```"
+
+def parse_generated_code(text: str) -> WebsiteCode:
+    """Extract the HTML document and its embedded CSS from generated text."""
+    try:
+        # Work on index bounds over the original buffer so nothing is copied
+        # until the final slices
+        start, end = 0, len(text)
         
-        Text Content:
-        {json.dumps(design_context.get('text_snippets', {}), indent=2)}
+        # Prefer the fenced ```html block when the model wraps its answer in markdown
+        fence_start = text.find(HTML_FENCE)
+        if fence_start >= 0:
+            start = fence_start + len(HTML_FENCE)
+            fence_end = text.find(FENCE_END, start)
+            if fence_end >= 0:
+                end = fence_end
         
-        Original HTML Structure:
-        {design_context.get('raw_html_snippet', '')}
+        # Missing markers yield empty strings rather than slicing from -1
+        html_start = text.find("<html", start, end)
+        html_end = text.find("</html>", html_start, end) if html_start >= 0 else -1
+        html = ""
+        if html_end >= 0:
+            # The stylesheet is looked for only inside the document found
+            start, end = html_start, html_end + len(HTML_END)
+            html = text[start:end]
         
-        Requirements:
-        1. Generate clean, semantic HTML5 markup
-        2. Use modern CSS3 features for styling
-        3. Ensure responsive design that works on all devices
-        4. Match the original layout and design as closely as possible
-        5. Use the provided color palette and fonts
-        6. Implement proper accessibility features
-        7. Optimize for performance
+        # The opening tag may carry attributes (e.g. <style type="text/css">)
+        style_open = _STYLE_OPEN_RE.search(text, start, end)
+        css_end = text.find("</style>", style_open.end(), end) if style_open else -1
+        css = text[style_open.end():css_end] if css_end >= 0 else ""
         
-        Please provide the complete HTML and CSS code for the cloned website.
-        """
+        if not html and not css:
+            return _EMPTY
+        return WebsiteCode(
+            html=html,
+            css=css,
+            error=None
+        )
+    except Exception as e:
+        return WebsiteCode(
+            html="",
+            css="",
+            error=f"Failed to parse generated code: {str(e)}"
+        )
 
-        # Generate code using Gemini
+async def start_generation(model: genai.GenerativeModel, prompt: str) -> AsyncIterator[Any]:
+    """Start a streamed generation, backing off with full jitter while Gemini throttles."""
+    for attempt in range(GEMINI_MAX_ATTEMPTS):
+        await gemini_bucket.acquire()
         try:
-            response = await model.generate_content_async(prompt)
-            
-            if not response or not response.text:
-                return WebsiteCode(
-                    html="",
-                    css="",
-                    error="Failed to generate website code"
-                )
+            response = await asyncio.wait_for(model.generate_content_async(prompt, stream=True), GEMINI_TIMEOUT)
+        except TimeoutError as e:
+            raise TimeoutError(f"Gemini did not respond within {GEMINI_TIMEOUT:.0f}s") from e
+        except RETRYABLE_GEMINI_ERRORS as e:
+            gemini_bucket.decrease_rate()
+            if attempt == GEMINI_MAX_ATTEMPTS - 1:
+                raise
+            delay = random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt))
+            logger.warning("Gemini throttled (%s); retrying in %.1fs", e, delay)
+            await asyncio.sleep(delay)
+            continue
+        gemini_bucket.increase_rate()
+        return response
+
+async def iter_generated_text(response: AsyncIterator[Any]) -> AsyncIterator[str]:
+    """Yield text from a streamed response, stopping once the HTML document is closed."""
+    tail = ""
+    chunks = aiter(response)
+    while True:
+        # A stalled stream fails instead of hanging the request
+        try:
+            chunk = await asyncio.wait_for(anext(chunks), GEMINI_CHUNK_TIMEOUT)
+        except StopAsyncIteration:
+            return
+        except TimeoutError as e:
+            raise TimeoutError(f"Gemini stream stalled for {GEMINI_CHUNK_TIMEOUT:.0f}s") from e
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. safety metadata) carry no code
+            continue
+        if not text:
+            continue
+        yield text
+        # Whatever follows </html> (closing fence, commentary) is never used;
+        # the tail catches a marker split across chunks
+        if HTML_END in tail + text:
+            return
+        tail = (tail + text)[-(len(HTML_END) - 1):]
+
+async def call_gemini(model: genai.GenerativeModel, prompt: str, cache_key: str) -> WebsiteCode:
+    """Generate code for a prompt with Gemini and cache a complete result."""
+    try:
+        # Streamed so generation can be abandoned as soon as the document is complete
+        async with gemini_semaphore:
+            response = await start_generation(model, prompt)
+            text = "".join([chunk async for chunk in iter_generated_text(response)])
+        
+        if not text:
+            return WebsiteCode(
+                html="",
+                css="",
+                error="Failed to generate website code"
+            )
+        
+        logger.debug("Received %d characters from Gemini: %.100s", len(text), text)
+        
+        # Parse the response to extract HTML and CSS
+        generated_code = parse_generated_code(text)
+        await llm_cache.set(cache_key, generated_code)
+        return generated_code
             
-            # Parse the response to extract HTML and CSS
-            try:
-                html_start = response.text.find("<html")
-                html_end = response.text.find("</html>") + 7
-                html = response.text[html_start:html_end]
-                
-                css_start = response.text.find("<style>") + 7
-                css_end = response.text.find("</style>")
-                css = response.text[css_start:css_end]
-                
-                return WebsiteCode(
-                    html=html,
-                    css=css,
-                    error=None
-                )
-            except Exception as e:
-                return WebsiteCode(
-                    html="",
-                    css="",
-                    error=f"Failed to parse generated code: {str(e)}"
-                )
-                
-        except Exception as e:
-            logger.error(f"Error calling Gemini API: {str(e)}")
+    except Exception as e:
+        logger.error("Error calling Gemini API: %s", e)
+        return WebsiteCode(
+            html="",
+            css="",
+            error=f"Failed to call Gemini API: {str(e)}"
+        )
+
+async def generate_website_code(
+    design_context: Dict[str, Any],
+    model_name: str = "gemini-2.0-flash-exp",
+    prompt: Optional[str] = None,
+    prompt_style: str = "website"
+) -> WebsiteCode:
+    """
+    Generate website code using Gemini Pro based on design context.
+    The prompt is built with the PROMPT_BUILDERS entry for prompt_style unless
+    one is passed in already built.
+    """
+    try:
+        model = get_model(model_name)
+        if not model:
             return WebsiteCode(
                 html="",
                 css="",
-                error=f"Failed to call Gemini API: {str(e)}"
+                error="Gemini model not initialized"
             )
+
+        # Construct the prompt
+        if prompt is None:
+            prompt = PROMPT_BUILDERS[prompt_style](design_context)
+
+        # Reuse a previous generation for an identical prompt
+        cache_key = LLMCache.key(model_name, prompt)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Then for a near-duplicate design context, if the semantic cache is on
+        vector = None
+        if semantic_cache is not None:
+            layout = layout_hash(design_context)
+            variant = (model_name, prompt_style)
+            try:
+                vector = await semantic_cache.embed(design_context)
+            except Exception as e:
+                logger.warning("Skipping semantic cache, embedding failed: %s", e)
+            else:
+                cached = semantic_cache.lookup(vector, layout, variant)
+                if cached is not None:
+                    return cached
+
+        # Concurrent callers with the same prompt share one in-flight Gemini call;
+        # shielded so one caller's cancellation doesn't cancel it for the others
+        task = inflight_generations.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(call_gemini(model, prompt, cache_key))
+            inflight_generations[cache_key] = task
+            task.add_done_callback(lambda _: inflight_generations.pop(cache_key, None))
+        generated_code = await asyncio.shield(task)
+        
+        if vector is not None:
+            semantic_cache.add(cache_key, vector, layout, variant, generated_code)
+        return generated_code
             
     except Exception as e:
-        logger.error(f"Error generating website code: {str(e)}")
+        logger.error("Error generating website code: %s", e)
         return WebsiteCode(
             html="",
             css="",
             error=f"Failed to generate website code: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+async def stream_website_code(
+    design_context: Dict[str, Any],
+    model_name: str = "gemini-2.0-flash-exp",
+    prompt: Optional[str] = None,
+    prompt_style: str = "website"
+) -> AsyncIterator[str]:
+    """
+    Stream generated website code from Gemini as text chunks arrive.
+    Raises RuntimeError if the model is not initialized.
+    """
+    model = get_model(model_name)
+    if not model:
+        raise RuntimeError("Gemini model not initialized")
+    
+    if prompt is None:
+        prompt = PROMPT_BUILDERS[prompt_style](design_context)
+    async with gemini_semaphore:
+        response = await start_generation(model, prompt)
+        async for text in iter_generated_text(response):
+            yield text
@@ -0,0 +1,170 @@
+"""
+Per-host request pacing and failure tracking for scraping.
+"""
+from typing import Dict, Optional
+import asyncio
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+class TokenBucket:
+    """Token bucket whose refill rate adapts to how the server responds.
+
+    Successful responses slowly raise the rate; throttling responses cut it
+    multiplicatively and can pause the bucket entirely for a Retry-After period.
+    """
+
+    def __init__(
+        self,
+        capacity: float = 5,
+        refill_rate: float = 1.0,
+        min_rate: float = 0.1,
+        max_rate: float = 10.0,
+        increase_factor: float = 1.1,
+        decrease_factor: float = 0.5
+    ):
+        self.capacity = capacity
+        self.tokens = capacity
+        self.refill_rate = refill_rate  # tokens per second
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_factor = increase_factor
+        self.decrease_factor = decrease_factor
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.refill_rate)
+
+    def increase_rate(self):
+        """Speed up after a successful response."""
+        self.refill_rate = min(self.max_rate, self.refill_rate * self.increase_factor)
+
+    def decrease_rate(self, retry_after: Optional[float] = None):
+        """Back off after a throttled or failed response, honoring Retry-After if given."""
+        self._refill()
+        self.refill_rate = max(self.min_rate, self.refill_rate * self.decrease_factor)
+        self.tokens = 0
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delay in seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class CircuitBreaker:
+    """Client-side circuit breaker that fails fast on persistently failing hosts.
+
+    Outcomes are tracked over a rolling window. Once enough samples fail the
+    breaker opens and rejects requests; after `reset_timeout` it lets a single
+    trial request through (half-open) and closes again if that succeeds. A trial
+    that never reports an outcome is replaced after another `reset_timeout`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        rolling_window: float = 60.0,
+        trip_threshold: float = 0.5,
+        min_samples: int = 4,
+        reset_timeout: float = 30.0
+    ):
+        self.rolling_window = rolling_window
+        self.trip_threshold = trip_threshold
+        self.min_samples = min_samples
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.trial_started_at = 0.0
+        self._samples: deque = deque()  # (timestamp, ok) in arrival order
+
+    def _prune(self, now: float):
+        while self._samples and now - self._samples[0][0] > self.rolling_window:
+            self._samples.popleft()
+
+    def allow_request(self) -> bool:
+        """Return False while the breaker is open; admit one trial once it may half-open."""
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self.trial_started_at = now
+            return True
+        if self.state == self.HALF_OPEN:
+            # Only the single trial request is in flight while half-open, but a
+            # trial whose outcome was never reported must not wedge the breaker
+            if now - self.trial_started_at < self.reset_timeout:
+                return False
+            self.trial_started_at = now
+            return True
+        return True
+
+    def on_success(self):
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            self.state = self.CLOSED
+            self._samples.clear()
+        self._samples.append((now, True))
+        self._prune(now)
+
+    def on_failure(self):
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            self._trip(now)
+            return
+        self._samples.append((now, False))
+        self._prune(now)
+        failures = sum(1 for _, ok in self._samples if not ok)
+        if len(self._samples) >= self.min_samples and failures / len(self._samples) >= self.trip_threshold:
+            self._trip(now)
+
+    def release_trial(self):
+        """Let a new half-open trial through when the current one ended without a verdict."""
+        if self.state == self.HALF_OPEN:
+            self.trial_started_at = time.monotonic() - self.reset_timeout
+
+    def _trip(self, now: float):
+        self.state = self.OPEN
+        self.opened_at = now
+        self._samples.clear()
+
+# One bucket and breaker per host so politeness and failure tracking are
+# coordinated across concurrent requests
+host_buckets: Dict[str, TokenBucket] = defaultdict(TokenBucket)
+host_breakers: Dict[str, CircuitBreaker] = defaultdict(CircuitBreaker)
@@ -0,0 +1,56 @@
+"""
+Pre-populate the generation cache from a corpus of design contexts.
+
+Usage: python warmup.py contexts.jsonl
+
+Each line holds one design context as returned by /api/extract. Generated sites
+are written to the persistent generation cache, so the server answers those
+pages from disk instead of calling Gemini.
+"""
+import argparse
+import asyncio
+import base64
+import logging
+from typing import Any, Dict
+
+import orjson
+
+from main import GEMINI_MODEL, load_settings
+from utils.llm_generator import configure_gemini, generate_website_code, llm_cache
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def restore_design_context(design_context: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn an /api/extract response back into the in-process shape, so prompts and cache keys match."""
+    screenshot = design_context.get("screenshot")
+    if not screenshot:
+        return design_context
+
+    screenshot = dict(screenshot)
+    image = screenshot.pop("base64_image", None)
+    screenshot["image"] = base64.b64decode(image) if image else None
+    return {**design_context, "screenshot": screenshot}
+
+async def warm(path: str):
+    configure_gemini(load_settings().gemini_api_key, model_names=[GEMINI_MODEL])
+
+    with open(path, "rb") as f:
+        contexts = [restore_design_context(orjson.loads(line)) for line in f if line.strip()]
+
+    # Concurrency and pacing are bounded inside the generator
+    results = await asyncio.gather(
+        *(generate_website_code(context, model_name=GEMINI_MODEL) for context in contexts)
+    )
+
+    failed = sum(1 for result in results if result.error)
+    logger.info(
+        "Warmed %d of %d design contexts (%d cache hits)",
+        len(results) - failed, len(results), llm_cache.stats["hits"]
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-populate the generation cache")
+    parser.add_argument("contexts", help="JSONL file with one design context per line")
+    args = parser.parse_args()
+    asyncio.run(warm(args.contexts))
@@ -16,7 +16,7 @@ interface ScrapedData {
     width?: string;
     height?: string;
   }>;
-  fonts: string[];
+  fonts?: string[];
   colors: string[];
   layout_structure: any;
   metadata: {
@@ -28,10 +28,7 @@ interface ScrapedData {
       height: number;
     };
   };
-  design_context?: {
-    color_palette?: string[];
-    fonts?: string[];
-  };
+  color_palette?: string[];
 }
 
 export default function Home() {
@@ -51,7 +48,7 @@ export default function Home() {
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ url, options: {} }),
+        body: JSON.stringify({ url }),
       });
 
       if (!response.ok) {
@@ -105,7 +102,7 @@ export default function Home() {
             <div className="space-y-2">
               <h4 className="font-medium">Colors</h4>
               <div className="flex flex-wrap gap-2">
-                {scrapedData.design_context?.color_palette?.map((color, index) => (
+                {scrapedData.color_palette?.map((color, index) => (
                   <div
                     key={index}
                     className="w-8 h-8 rounded-full shadow-md"
@@ -118,7 +115,7 @@ export default function Home() {
             <div className="space-y-2">
               <h4 className="font-medium">Fonts</h4>
               <ul className="list-disc list-inside">
-                {scrapedData.design_context?.fonts?.map((font, index) => (
+                {scrapedData.fonts?.map((font, index) => (
                   <li key={index}>{font}</li>
                 ))}
               </ul>